@@ -1,7 +1,10 @@
 import discord
 from discord.ext import commands
-import sqlite3
+import aiosqlite
+import asyncio
+import bisect
 import os
+import typing
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -11,7 +14,13 @@ intents.guilds = True
 intents.messages = True
 intents.message_content = True  # Required to read message content
 
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+class MerlinBot(commands.Bot):
+    async def close(self):
+        await super().close()
+        # Commit any pending writes and close the database on shutdown
+        await close_db()
+
+bot = MerlinBot(command_prefix='!', intents=intents, help_command=None)
 
 load_dotenv()
 
@@ -93,77 +102,298 @@ badges = [
     }
 ]
 
-# Set up SQLite database connection
-conn = sqlite3.connect('bot_data.db')
-cursor = conn.cursor()
-
-# Create tables for users, completed quests, and awarded badges
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    xp INTEGER DEFAULT 0
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS completed_quests (
-    user_id INTEGER,
-    quest_name TEXT,
-    PRIMARY KEY (user_id, quest_name),
-    FOREIGN KEY(user_id) REFERENCES users(user_id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS awarded_badges (
-    user_id INTEGER,
-    badge_name TEXT,
-    PRIMARY KEY (user_id, badge_name),
-    FOREIGN KEY(user_id) REFERENCES users(user_id)
-)
-''')
-
-# Create attendance table with xp_awarded field
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS attendance (
-    meeting_id TEXT NOT NULL,
-    user_id INTEGER NOT NULL,
-    date TEXT NOT NULL,
-    xp_awarded BOOLEAN DEFAULT FALSE,
-    PRIMARY KEY (meeting_id, user_id),
-    FOREIGN KEY(user_id) REFERENCES users(user_id)
-)
-''')
-
-conn.commit()
+# Inverted index from each mission to the badges that require it
+badges_by_mission = {}
+for badge in badges:
+    for badge_mission in badge["missions"]:
+        badges_by_mission.setdefault(badge_mission, []).append(badge)
+
+# Per-user badge progress, loaded on first use: user ID -> {badge name: missions completed}
+badge_progress = {}
+
+# SQLite database, shared by every command through one async connection
+DATABASE = 'bot_data.db'
+COMMIT_DELAY = 0.5  # Seconds to gather writes before committing them together
+
+db = None
+db_lock = asyncio.Lock()
+write_lock = asyncio.Lock()  # Keeps commits and single writes out of multi-statement updates
+commit_task = None
+
+async def get_db():
+    global db
+    if db is not None:
+        return db
+    async with db_lock:
+        if db is None:
+            connection = await aiosqlite.connect(DATABASE)
+            await connection.execute('PRAGMA journal_mode=WAL')
+            await connection.execute('PRAGMA synchronous=NORMAL')
+            await create_tables(connection)
+            await load_xp_ranking(connection)
+            db = connection
+    return db
+
+async def create_tables(connection):
+    # Create tables for users, completed quests, and awarded badges
+    await connection.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        xp INTEGER DEFAULT 0
+    )
+    ''')
+    await connection.execute('CREATE INDEX IF NOT EXISTS idx_users_xp ON users (xp DESC)')
+
+    await connection.execute('''
+    CREATE TABLE IF NOT EXISTS completed_quests (
+        user_id INTEGER,
+        quest_name TEXT,
+        PRIMARY KEY (user_id, quest_name),
+        FOREIGN KEY(user_id) REFERENCES users(user_id)
+    )
+    ''')
+
+    await connection.execute('''
+    CREATE TABLE IF NOT EXISTS awarded_badges (
+        user_id INTEGER,
+        badge_name TEXT,
+        PRIMARY KEY (user_id, badge_name),
+        FOREIGN KEY(user_id) REFERENCES users(user_id)
+    )
+    ''')
+
+    # Create attendance table with xp_awarded field
+    await connection.execute('''
+    CREATE TABLE IF NOT EXISTS attendance (
+        meeting_id TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        xp_awarded BOOLEAN DEFAULT FALSE,
+        PRIMARY KEY (meeting_id, user_id),
+        FOREIGN KEY(user_id) REFERENCES users(user_id)
+    )
+    ''')
+
+    await connection.commit()
+
+# Writes are committed in groups: every write schedules one commit a moment later,
+# so a burst of commands shares a single fsync. Reads on the same connection see
+# the uncommitted writes straight away.
+def schedule_commit():
+    global commit_task
+    if commit_task is None or commit_task.done():
+        commit_task = asyncio.get_running_loop().create_task(delayed_commit())
+
+async def delayed_commit():
+    await asyncio.sleep(COMMIT_DELAY)
+    try:
+        async with write_lock:
+            await db.commit()
+    except Exception as e:
+        print(f"An error occurred while committing to the database: {e}")
+
+async def close_db():
+    global db
+    if commit_task is not None and not commit_task.done():
+        commit_task.cancel()
+    if db is not None:
+        await db.commit()
+        await db.close()
+        db = None
+
+async def fetchone(query, params=()):
+    connection = await get_db()
+    async with connection.execute(query, params) as cursor:
+        return await cursor.fetchone()
+
+async def fetchall(query, params=()):
+    connection = await get_db()
+    async with connection.execute(query, params) as cursor:
+        return await cursor.fetchall()
+
+async def execute(query, params=()):
+    connection = await get_db()
+    # Wait for any open savepoint, otherwise its rollback would silently undo this write too
+    async with write_lock:
+        await connection.execute(query, params)
+    schedule_commit()
+
+# In-memory XP ranking. A Fenwick tree over the distinct XP values (by their position in
+# the sorted `values` list) counts how many users sit at or below each value, so memory
+# grows with users and distinct values, never with how high XP goes. Rank lookups and
+# updates are O(log distinct values); a value appearing or disappearing rebuilds the tree
+# in O(distinct values), the same cost as inserting into `values`. Top-N walks the
+# distinct values from the top down.
+class XPRanking:
+    def __init__(self):
+        self.tree = [0]  # Fenwick tree of user counts, indexed by position in values (1-based)
+        self.xp = {}  # Key: user ID, Value: XP
+        self.users_at = {}  # Key: XP value, Value: sorted list of user IDs with that XP
+        self.values = []  # Distinct XP values held by at least one user, ascending
+
+    def __len__(self):
+        return len(self.xp)
+
+    def get(self, user_id):
+        return self.xp.get(user_id)
+
+    def _rebuild(self):
+        # Linear-time Fenwick build from the per-value counts
+        tree = [0] * (len(self.values) + 1)
+        for i, value in enumerate(self.values, start=1):
+            tree[i] += len(self.users_at[value])
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _update(self, value, delta):
+        i = bisect.bisect_left(self.values, value) + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _count_at_or_below(self, value):
+        i = bisect.bisect_right(self.values, value)
+        count = 0
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        return count
+
+    def load(self, rows):
+        # Replace the ranking with (user ID, XP) rows; each tie group is sorted once, not insorted per user
+        self.xp = dict(rows)
+        self.users_at = {}
+        for user_id, value in self.xp.items():
+            self.users_at.setdefault(value, []).append(user_id)
+        for users in self.users_at.values():
+            users.sort()
+        self.values = sorted(self.users_at)
+        self._rebuild()
+
+    def _remove(self, user_id):
+        old_value = self.xp.pop(user_id, None)
+        if old_value is None:
+            return
+        users = self.users_at[old_value]
+        del users[bisect.bisect_left(users, user_id)]
+        if users:
+            self._update(old_value, -1)
+        else:
+            del self.users_at[old_value]
+            del self.values[bisect.bisect_left(self.values, old_value)]
+            self._rebuild()
+
+    def set(self, user_id, value):
+        # Values are kept exactly as stored, negative ones included, so !xp matches the database
+        if self.xp.get(user_id) == value:
+            return
+        self._remove(user_id)
+        self.xp[user_id] = value
+        if value in self.users_at:
+            bisect.insort(self.users_at[value], user_id)
+            self._update(value, 1)
+        else:
+            self.users_at[value] = [user_id]
+            bisect.insort(self.values, value)
+            self._rebuild()
+
+    def add(self, user_id, amount):
+        self.set(user_id, self.xp.get(user_id, 0) + amount)
+
+    def rank(self, user_id):
+        # 1-based rank; users tied on XP share a rank
+        value = self.xp.get(user_id)
+        if value is None:
+            return None
+        return len(self.xp) - self._count_at_or_below(value) + 1
+
+    def top(self, count, offset=0):
+        # (user ID, XP) pairs from the highest XP down, skipping the first `offset`
+        result = []
+        for value in reversed(self.values):
+            users = self.users_at[value]
+            if offset >= len(users):
+                offset -= len(users)
+                continue
+            for user_id in users[offset:offset + count - len(result)]:
+                result.append((user_id, value))
+            if len(result) == count:
+                return result
+            offset = 0
+        return result
+
+xp_ranking = XPRanking()
+
+async def load_xp_ranking(connection):
+    async with connection.execute('SELECT user_id, xp FROM users') as cursor:
+        xp_ranking.load((user_id, xp or 0) for user_id, xp in await cursor.fetchall())
 
 # Functions for user XP management and quest tracking
-def get_user_xp(user_id):
-    cursor.execute('SELECT xp FROM users WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    if result is None:
-        cursor.execute('INSERT INTO users (user_id, xp) VALUES (?, ?)', (user_id, 0))
-        conn.commit()
-        return 0
-    return result[0]
-
-def set_user_xp(user_id, xp):
-    cursor.execute('''
+async def get_user_xp(user_id):
+    await get_db()
+    xp = xp_ranking.get(user_id)
+    if xp is None:
+        await execute('INSERT OR IGNORE INTO users (user_id, xp) VALUES (?, ?)', (user_id, 0))
+        # A complete_mission or record_attendance for this user may have finished while
+        # execute() waited for write_lock; only a user who is still unknown starts at 0
+        xp = xp_ranking.get(user_id)
+        if xp is None:
+            xp_ranking.set(user_id, 0)
+            xp = 0
+    return xp
+
+async def set_user_xp(user_id, xp):
+    await execute('''
         INSERT INTO users (user_id, xp) VALUES (?, ?)
         ON CONFLICT(user_id) DO UPDATE SET xp=excluded.xp
     ''', (user_id, xp))
-    conn.commit()
+    xp_ranking.set(user_id, xp)
 
-def user_completed_quests(user_id):
-    cursor.execute('SELECT quest_name FROM completed_quests WHERE user_id = ?', (user_id,))
-    rows = cursor.fetchall()
+async def user_completed_quests(user_id):
+    rows = await fetchall('SELECT quest_name FROM completed_quests WHERE user_id = ?', (user_id,))
     return [row[0] for row in rows]
 
-def user_awarded_badges(user_id):
-    cursor.execute('SELECT badge_name FROM awarded_badges WHERE user_id = ?', (user_id,))
-    rows = cursor.fetchall()
+async def user_awarded_badges(user_id):
+    rows = await fetchall('SELECT badge_name FROM awarded_badges WHERE user_id = ?', (user_id,))
     return [row[0] for row in rows]
 
+async def complete_mission(user_id, mission):
+    # Record the completion, award XP and any badges as one unit.
+    # Returns (new XP, newly awarded badges), or None if the mission was already completed.
+    connection = await get_db()
+    async with write_lock:
+        await connection.execute('SAVEPOINT complete_mission')
+        try:
+            async with connection.execute(
+                'INSERT OR IGNORE INTO completed_quests (user_id, quest_name) VALUES (?, ?)',
+                (user_id, mission["name"])
+            ) as cursor:
+                already_completed = cursor.rowcount == 0
+            if already_completed:
+                await connection.execute('RELEASE complete_mission')
+                return None
+
+            async with connection.execute('''
+                INSERT INTO users (user_id, xp) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET xp = xp + excluded.xp
+                RETURNING xp
+            ''', (user_id, mission["xp_reward"])) as cursor:
+                new_xp = (await cursor.fetchone())[0]
+
+            new_badges = await check_badges(user_id, mission["name"])
+        except Exception:
+            # The cached progress may already include this completion
+            badge_progress.pop(user_id, None)
+            await connection.execute('ROLLBACK TO complete_mission')
+            await connection.execute('RELEASE complete_mission')
+            raise
+        await connection.execute('RELEASE complete_mission')
+    schedule_commit()
+    xp_ranking.set(user_id, new_xp)
+    return new_xp, new_badges
+
 # Simple level thresholds (kept for display in status, if y'all fancy)
 level_thresholds = [
     (1, 50),
@@ -193,19 +423,73 @@ async def send_dm_or_channel_fallback(ctx, content=None, embed=None):
         else:
             await ctx.send(f"{ctx.author.mention}, I couldn’t send you a DM. Please enable DMs and try again.\n{content if content else ''}")
 
+async def record_attendance(meeting_id, user_ids, xp_amount):
+    # Record attendance and award XP for many users in one transaction.
+    # Returns the IDs that were newly recorded; users already marked are skipped.
+    connection = await get_db()
+    date = datetime.now().strftime("%Y-%m-%d")
+    async with write_lock:
+        await connection.execute('SAVEPOINT record_attendance')
+        try:
+            async with connection.execute('SELECT user_id FROM attendance WHERE meeting_id = ?', (meeting_id,)) as cursor:
+                already_marked = {row[0] for row in await cursor.fetchall()}
+            new_ids = [user_id for user_id in user_ids if user_id not in already_marked]
+
+            await connection.executemany(
+                'INSERT INTO attendance (meeting_id, user_id, date, xp_awarded) VALUES (?, ?, ?, ?)',
+                [(meeting_id, user_id, date, True) for user_id in new_ids]
+            )
+            await connection.executemany('''
+                INSERT INTO users (user_id, xp) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET xp = xp + excluded.xp
+            ''', [(user_id, xp_amount) for user_id in new_ids])
+        except Exception:
+            await connection.execute('ROLLBACK TO record_attendance')
+            await connection.execute('RELEASE record_attendance')
+            raise
+        await connection.execute('RELEASE record_attendance')
+    schedule_commit()
+    for user_id in new_ids:
+        xp_ranking.add(user_id, xp_amount)
+    return new_ids
+
+async def load_badge_progress(user_id):
+    completed = await user_completed_quests(user_id)
+    progress = {}
+    for quest_name in completed:
+        for badge in badges_by_mission.get(quest_name, ()):
+            progress[badge["name"]] = progress.get(badge["name"], 0) + 1
+    badge_progress[user_id] = progress
+    return progress
+
 # Function to check and award badges
-def check_badges(user_id):
-    completed = set(user_completed_quests(user_id))
-    awarded = set(user_awarded_badges(user_id))
+async def check_badges(user_id, mission_name):
+    # Only badges that include the mission just completed can have become complete
+    candidates = badges_by_mission.get(mission_name, ())
+    if not candidates:
+        return []
+
+    progress = badge_progress.get(user_id)
+    if progress is None:
+        # Loading reads the completion that was just recorded, so no increment is needed
+        progress = await load_badge_progress(user_id)
+    else:
+        for badge in candidates:
+            progress[badge["name"]] = progress.get(badge["name"], 0) + 1
+
+    connection = await get_db()
     newly_awarded = []
-    for badge in badges:
+    for badge in candidates:
         badge_name = badge["name"]
-        required_missions = set(badge["missions"])
         # Check if user has completed all missions in this badge and hasn't been awarded it yet
-        if required_missions.issubset(completed) and badge_name not in awarded:
-            cursor.execute('INSERT INTO awarded_badges (user_id, badge_name) VALUES (?, ?)', (user_id, badge_name))
-            conn.commit()
-            newly_awarded.append(badge_name)
+        if progress.get(badge_name, 0) >= len(badge["missions"]):
+            async with connection.execute(
+                'INSERT OR IGNORE INTO awarded_badges (user_id, badge_name) VALUES (?, ?)',
+                (user_id, badge_name)
+            ) as cursor:
+                if cursor.rowcount:
+                    newly_awarded.append(badge_name)
+    schedule_commit()
     return newly_awarded
 
 @bot.event
@@ -216,7 +500,7 @@ async def on_ready():
 @bot.command()
 async def missions_list(ctx):
     user_id = ctx.author.id
-    completed = user_completed_quests(user_id)
+    completed = await user_completed_quests(user_id)
     embed = discord.Embed(title="Available Quests", color=discord.Color.gold())
     # List all missions, no level restrictions here
     for mission in missions:
@@ -252,22 +536,17 @@ async def mission(ctx, action: str, *, mission_name: str):
         )
         await send_dm_or_channel_fallback(ctx, msg)
     elif action.lower() == "complete":
-        completed = user_completed_quests(user_id)
-        if found_mission["name"] in completed:
+        # Directly mark the mission as complete and award XP
+        result = await complete_mission(user_id, found_mission)
+        if result is None:
             await send_dm_or_channel_fallback(ctx, f"You've already completed **{found_mission['name']}**.")
             return
-        # Directly mark the mission as complete and award XP
-        cursor.execute('INSERT INTO completed_quests (user_id, quest_name) VALUES (?, ?)', (user_id, found_mission["name"]))
-        conn.commit()
-        current_xp = get_user_xp(user_id)
-        new_xp = current_xp + found_mission["xp_reward"]
-        set_user_xp(user_id, new_xp)
+        new_xp, new_badges = result
         await send_dm_or_channel_fallback(
             ctx, 
             f"Congratulations! Your completion of **{found_mission['name']}** has been recorded! You gained {found_mission['xp_reward']} XP and now have {new_xp} XP."
         )
-        # Check for badge awards after mission completion and announce 'em publicly
-        new_badges = check_badges(user_id)
+        # Announce any badges earned by this completion publicly
         if new_badges:
             badges_text = ", ".join(new_badges)
             await ctx.send(f"Yeehaw! {ctx.author.mention}, you've earned the following badge(s): {badges_text}")
@@ -276,28 +555,53 @@ async def mission(ctx, action: str, *, mission_name: str):
 @bot.command()
 async def xp(ctx):
     user_id = ctx.author.id
-    user_current_xp = get_user_xp(user_id)
+    user_current_xp = await get_user_xp(user_id)
     await send_dm_or_channel_fallback(ctx, f"You currently have {user_current_xp} XP.")
 
 # Command to display user status
 @bot.command()
 async def status(ctx):
     user_id = ctx.author.id
-    user_current_xp = get_user_xp(user_id)
+    user_current_xp = await get_user_xp(user_id)
     user_level = get_level(user_current_xp)
-    completed = user_completed_quests(user_id)
-    awarded = user_awarded_badges(user_id)
+    completed = await user_completed_quests(user_id)
+    awarded = await user_awarded_badges(user_id)
     completed_list = ", ".join(completed) if completed else "None"
     badges_list = ", ".join(awarded) if awarded else "None"
+    user_rank = xp_ranking.rank(user_id)
     msg = (
         f"**Your Questing Status:**\n"
         f"**Level:** {user_level}\n"
         f"**Completed Quests:** {completed_list}\n"
         f"**XP:** {user_current_xp}\n"
+        f"**Rank:** #{user_rank} of {len(xp_ranking)}\n"
         f"**Badges Earned:** {badges_list}"
     )
     await send_dm_or_channel_fallback(ctx, msg)
 
+# Command to show the XP leaderboard
+XP_LEADERBOARD_PAGE_SIZE = 10
+
+@bot.command()
+async def xp_leaderboard(ctx, page: int = 1):
+    await get_db()
+    if not xp_ranking:
+        await ctx.send("Nobody has earned any XP yet. Get questin', partner!")
+        return
+
+    page_count = max(1, -(-len(xp_ranking) // XP_LEADERBOARD_PAGE_SIZE))
+    if page < 1 or page > page_count:
+        await ctx.send(f"Page {page} does not exist. The leaderboard has {page_count} page(s).")
+        return
+
+    offset = (page - 1) * XP_LEADERBOARD_PAGE_SIZE
+    embed = discord.Embed(title="Hall of Heroes", description=f"Page {page}/{page_count}", color=discord.Color.gold())
+    for user_id, user_xp in xp_ranking.top(XP_LEADERBOARD_PAGE_SIZE, offset):
+        user = bot.get_user(user_id)
+        username = user.display_name if user else f"User ID {user_id}"
+        embed.add_field(name=f"#{xp_ranking.rank(user_id)} {username}", value=f"{user_xp} XP (Level {get_level(user_xp)})", inline=False)
+    await ctx.send(embed=embed)
+
 # Command to display a simple roadmap of missions
 @bot.command()
 async def roadmap(ctx):
@@ -312,7 +616,7 @@ async def badges(ctx, user: discord.Member = None):
     # Allow officers to view other users' badges; otherwise, show own badges
     if user is None:
         user = ctx.author
-    awarded = user_awarded_badges(user.id)
+    awarded = await user_awarded_badges(user.id)
     if awarded:
         badges_list = ", ".join(awarded)
         await ctx.send(f"{user.display_name} has earned the following badge(s): {badges_list}")
@@ -327,32 +631,50 @@ async def reset_user(ctx, user: discord.Member):
         await ctx.send("You do not have permission to reset user data.")
         return
     user_id = user.id
-    cursor.execute('DELETE FROM completed_quests WHERE user_id = ?', (user_id,))
-    cursor.execute('DELETE FROM awarded_badges WHERE user_id = ?', (user_id,))
-    conn.commit()
-    set_user_xp(user_id, 0)
+    await execute('DELETE FROM completed_quests WHERE user_id = ?', (user_id,))
+    await execute('DELETE FROM awarded_badges WHERE user_id = ?', (user_id,))
+    badge_progress.pop(user_id, None)
+    await set_user_xp(user_id, 0)
     await ctx.send(f"All quest history, badges, and XP for {user.mention} have been reset.")
 
-# Attendance command: mark attendance and award XP for club meetings (officer-only)
+# Attendance command: mark attendance and award XP for club meetings (officer-only).
+# Targets can be voice channels, roles or members; with none, the officer is marked.
+# The XP amount only matches 1..ATTENDANCE_MAX_XP, so a raw member ID (a huge number)
+# falls through to the targets instead of being read as the amount.
+ATTENDANCE_MAX_XP = 1000
+
 @bot.command()
-async def mark_attendance(ctx, meeting_id: str, xp_amount: int = 10):
+async def mark_attendance(ctx, meeting_id: str, xp_amount: typing.Optional[commands.Range[int, 1, ATTENDANCE_MAX_XP]] = 10, *targets: typing.Union[discord.VoiceChannel, discord.Role, discord.Member]):
     officer_role = discord.utils.get(ctx.guild.roles, name="Officer")
     if officer_role not in ctx.author.roles:
         await ctx.send("Y'all ain't got permission to mark attendance, partner!")
         return
-    user_id = ctx.author.id
-    date = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute('SELECT xp_awarded FROM attendance WHERE meeting_id = ? AND user_id = ?', (meeting_id, user_id))
-    result = cursor.fetchone()
-    if result:
-        await ctx.send(f"You've already been marked for attendance at meeting {meeting_id}.")
-    else:
-        cursor.execute('INSERT INTO attendance (meeting_id, user_id, date, xp_awarded) VALUES (?, ?, ?, ?)', (meeting_id, user_id, date, True))
-        conn.commit()
-        current_xp = get_user_xp(user_id)
-        new_xp = current_xp + xp_amount
-        set_user_xp(user_id, new_xp)
-        await ctx.send(f"Attendance recorded and {xp_amount} XP awarded for {ctx.author.display_name} for meeting {meeting_id}.")
+
+    if not targets:
+        new_ids = await record_attendance(meeting_id, [ctx.author.id], xp_amount)
+        if not new_ids:
+            await ctx.send(f"You've already been marked for attendance at meeting {meeting_id}.")
+        else:
+            await ctx.send(f"Attendance recorded and {xp_amount} XP awarded for {ctx.author.display_name} for meeting {meeting_id}.")
+        return
+
+    # Gather everyone in the given voice channels and roles, plus any mentioned members
+    attendees = {}
+    for target in targets:
+        members = target.members if isinstance(target, (discord.VoiceChannel, discord.Role)) else [target]
+        for member in members:
+            if not member.bot:
+                attendees[member.id] = member
+    if not attendees:
+        await ctx.send("Couldn't find anyone to mark, partner. Check those channels, roles or mentions.")
+        return
+
+    new_ids = await record_attendance(meeting_id, list(attendees), xp_amount)
+    skipped = len(attendees) - len(new_ids)
+    msg = f"Attendance recorded and {xp_amount} XP awarded for {len(new_ids)} member(s) for meeting {meeting_id}."
+    if skipped:
+        msg += f" {skipped} member(s) were already marked."
+    await ctx.send(msg)
 
 # Command to show attendance (officer-only)
 @bot.command()
@@ -362,13 +684,11 @@ async def show_attendance(ctx, meeting_id: str = None, user: discord.Member = No
         await ctx.send("Y'all ain't got permission to view attendance, partner!")
         return
     if meeting_id:
-        cursor.execute('SELECT user_id FROM attendance WHERE meeting_id = ?', (meeting_id,))
-        attendees = cursor.fetchall()
+        attendees = await fetchall('SELECT user_id FROM attendance WHERE meeting_id = ?', (meeting_id,))
         attendees_list = ', '.join([str(id[0]) for id in attendees])
         await ctx.send(f"Attendees for meeting {meeting_id}: {attendees_list}")
     elif user:
-        cursor.execute('SELECT meeting_id FROM attendance WHERE user_id = ?', (user.id,))
-        meetings_attended = cursor.fetchall()
+        meetings_attended = await fetchall('SELECT meeting_id FROM attendance WHERE user_id = ?', (user.id,))
         meetings_list = ', '.join([str(meeting[0]) for meeting in meetings_attended])
         await ctx.send(f"{user.display_name} has attended the following meetings: {meetings_list}")
     else:
@@ -386,10 +706,11 @@ async def custom_help(ctx):
     embed.add_field(name="!mission <start|complete> <mission_name>", value="Start or complete a mission. (Completion is auto-approved.) 📝", inline=False)
     embed.add_field(name="!xp", value="Shows your current XP. 📈", inline=False)
     embed.add_field(name="!status", value="Displays your current level, completed quests, XP, and badges earned. 🏆", inline=False)
+    embed.add_field(name="!xp_leaderboard [page]", value="Shows the adventurers with the most XP. 🏅", inline=False)
     embed.add_field(name="!roadmap", value="Shows a roadmap of all missions. 🗺️", inline=False)
     embed.add_field(name="!badges [@User]", value="Lists the badges earned by you or another user.", inline=False)
     embed.add_field(name="!reset_user @User", value="Clears all quest history, badges, and resets XP for a user. (Officer-only)", inline=False)
-    embed.add_field(name="!mark_attendance <meeting_id> [xp_amount]", value="Mark attendance for a meeting and gain XP. (Officer-only; Default XP is 10.)", inline=False)
+    embed.add_field(name="!mark_attendance <meeting_id> [xp_amount] [#voice-channel|@Role|@User ...]", value="Mark attendance for a meeting and award XP to everyone in the given voice channels, roles or mentions, or to yourself if none are given. (Officer-only; XP is 1-1000, default 10.)", inline=False)
     embed.add_field(name="!show_attendance [meeting_id|@User]", value="Shows attendance for a meeting or a user. (Officer-only)", inline=False)
     embed.add_field(name="!help", value="Displays this very help message. ❓", inline=False)
     embed.set_footer(text="Merlin the Wise • Your Guide in Questing")
@@ -398,4 +719,5 @@ async def custom_help(ctx):
     except discord.Forbidden:
         await ctx.send(f"{ctx.author.mention}, I couldn’t send you a DM. Please enable DMs and try again.")
 
-bot.run(MERLIN_BOT_TOKEN)
+if __name__ == '__main__':
+    bot.run(MERLIN_BOT_TOKEN)
@@ -1,9 +1,11 @@
 import nextcord
 from nextcord.ext import commands
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 import aiosqlite
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import smtplib
 import ssl
 from email_validator import validate_email, EmailNotValidError
@@ -14,15 +16,33 @@ import random
 import os
 from nextcord.ext.commands import cooldown, BucketType, CommandOnCooldown, MissingRole, BadArgument
 import feedparser
+import aiohttp
+import hashlib
+import bisect
+import difflib
+import csv
+import io
+import json
 import re
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
+try:
+    import yaml  # Optional: only needed for YAML newsletter imports
+except ImportError:
+    yaml = None
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
 dotenv_path="/Users/theodorelieber/Desktop/Projects/.env"
 load_dotenv()
-client = OpenAI(
-  api_key=os.environ['OPENAI_API_KEY'],  
+# Async client used for every OpenAI call so the event loop never waits on OpenAI
+async_client = AsyncOpenAI(
+  api_key=os.environ['OPENAI_API_KEY'],
 )
 
 intents = nextcord.Intents.default()
@@ -32,25 +52,191 @@ intents.message_content = True  # Required to read message content
 intents.members = True  # If you need member information
 
 
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
-scheduler = AsyncIOScheduler()
+class AIClubBot(commands.Bot):
+    async def close(self):
+        await super().close()
+        # Write out buffered scores, then close the shared database connections
+        await flush_user_scores()
+        await close_databases()
+        await stop_mail_worker()
+        if http_session is not None:
+            await http_session.close()
+
+bot = AIClubBot(command_prefix='!', intents=intents, help_command=None)
+# Newsletter jobs live in a persistent jobstore inside newsletters.db, so they survive
+# restarts without being re-added; recurring housekeeping jobs stay in memory
+scheduler = AsyncIOScheduler(jobstores={
+    'default': MemoryJobStore(),
+    'newsletters': SQLAlchemyJobStore(url='sqlite:///newsletters.db', tablename='apscheduler_jobs'),
+})
+startup_complete = False
 
 # Directory to store PDFs
 PDF_STORAGE_PATH = 'pdfs'
+# PDFs are stored once per content hash under objects/<first two hex digits>/<sha256>.pdf
+PDF_OBJECTS_PATH = os.path.join(PDF_STORAGE_PATH, 'objects')
+PDF_MAX_SIZE = 8 * 1024 * 1024
 
 # Ensure the directory exists
-if not os.path.exists(PDF_STORAGE_PATH):
-    os.makedirs(PDF_STORAGE_PATH)
+if not os.path.exists(PDF_OBJECTS_PATH):
+    os.makedirs(PDF_OBJECTS_PATH)
 
 def is_newsletter_manager():
     def predicate(ctx):
         return any(role.name == 'Newsletter Manager' for role in ctx.author.roles)
     return commands.check(predicate)
 
+NEWSLETTER_DATABASE = 'newsletters.db'
+NEWSLETTER_RETRY_DELAY = timedelta(minutes=10)  # Before retrying a newsletter whose send failed
+
+# Shared database connections, opened once per file and reused by every query
+db_connections = {}  # Key: database path, Value: open aiosqlite connection
+db_connect_lock = asyncio.Lock()
+
+async def get_db(path):
+    db = db_connections.get(path)
+    if db is not None:
+        return db
+    async with db_connect_lock:
+        # Another coroutine may have opened it while we waited for the lock
+        db = db_connections.get(path)
+        if db is None:
+            # Keep plenty of compiled statements around so repeated queries skip parsing
+            db = await aiosqlite.connect(path, cached_statements=256)
+            await db.execute('PRAGMA journal_mode=WAL')
+            await db.execute('PRAGMA synchronous=NORMAL')
+            db_connections[path] = db
+    return db
+
+@asynccontextmanager
+async def database(path):
+    # Same shape as aiosqlite.connect(), but the connection stays open afterwards
+    yield await get_db(path)
+
+async def close_databases():
+    for path, db in list(db_connections.items()):
+        try:
+            await db.commit()
+            await db.close()
+        except Exception as e:
+            print(f"An error occurred while closing {path}: {e}")
+    db_connections.clear()
+
+# Outbound dispatcher for background sends (newsletters, score feedback, mail results).
+# Each channel gets a token bucket matching Discord's per-channel limit, queued messages
+# go out in priority order, and low-priority text bound for the same channel is merged.
+PRIORITY_NEWSLETTER = 0
+PRIORITY_NORMAL = 1
+PRIORITY_FEEDBACK = 2
+CHANNEL_RATE_LIMIT = (5, 5.0)  # Messages per channel per period in seconds
+GLOBAL_RATE_LIMIT = (50, 1.0)  # Requests across all channels per period in seconds
+MAX_MESSAGE_LENGTH = 2000
+
+class TokenBucket:
+    __slots__ = ('capacity', 'refill_rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_take(self):
+        # Takes a token and returns 0, or returns how long to wait for the next one
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.refill_rate
+
+    async def acquire(self):
+        while True:
+            delay = self.try_take()
+            if delay == 0:
+                return
+            await asyncio.sleep(delay)
+
+class OutboundMessage:
+    __slots__ = ('kwargs', 'coalesce', 'future')
+
+    def __init__(self, kwargs, coalesce, future):
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.future = future
+
+async def discord_send(channel, **kwargs):
+    return await channel.send(**kwargs)
+
+class OutboundDispatcher:
+    def __init__(self, sender=discord_send, channel_limit=CHANNEL_RATE_LIMIT, global_limit=GLOBAL_RATE_LIMIT):
+        # sender is the transport; swap it for a fake one to exercise the dispatcher offline
+        self.sender = sender
+        self.channel_limit = channel_limit
+        self.global_bucket = TokenBucket(*global_limit)
+        self.queues = {}  # Key: channel ID, Value: heap of (priority, sequence, OutboundMessage)
+        self.buckets = {}  # Key: channel ID, Value: TokenBucket
+        self.workers = {}  # Key: channel ID, Value: task draining that channel's queue
+        self.sequence = itertools.count()
+
+    def send(self, channel, content=None, *, embed=None, priority=PRIORITY_NORMAL, coalesce=False):
+        # Queue a message and return a future resolving to the sent Message (None on failure).
+        # coalesce=True lets plain text be merged with other queued text for the channel.
+        kwargs = {}
+        if content is not None:
+            kwargs['content'] = content
+        if embed is not None:
+            kwargs['embed'] = embed
+        future = asyncio.get_running_loop().create_future()
+        item = OutboundMessage(kwargs, coalesce and embed is None, future)
+        heapq.heappush(self.queues.setdefault(channel.id, []), (priority, next(self.sequence), item))
+
+        worker = self.workers.get(channel.id)
+        if worker is None or worker.done():
+            self.workers[channel.id] = asyncio.get_running_loop().create_task(self.drain(channel))
+        return future
+
+    def next_batch(self, queue):
+        priority, _, item = heapq.heappop(queue)
+        batch = [item]
+        if not item.coalesce:
+            return batch, item.kwargs
+
+        # Merge queued text of the same priority while it fits in one message
+        content = item.kwargs['content']
+        while queue and queue[0][0] == priority and queue[0][2].coalesce:
+            next_content = queue[0][2].kwargs['content']
+            if len(content) + 1 + len(next_content) > MAX_MESSAGE_LENGTH:
+                break
+            content += '\n' + next_content
+            batch.append(heapq.heappop(queue)[2])
+        return batch, {'content': content}
+
+    async def drain(self, channel):
+        queue = self.queues[channel.id]
+        bucket = self.buckets.setdefault(channel.id, TokenBucket(*self.channel_limit))
+        while queue:
+            # Wait for budget first: anything queued meanwhile can still be merged or jump ahead
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            batch, kwargs = self.next_batch(queue)
+            try:
+                message = await self.sender(channel, **kwargs)
+            except Exception as e:
+                print(f"An error occurred while sending to channel {channel.id}: {e}")
+                message = None
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(message)
+        del self.queues[channel.id]
+
+outbound = OutboundDispatcher()
+
 DATABASE = 'user_scores.db'
 # User score database
 async def init_score_db():
-    async with aiosqlite.connect(DATABASE) as db:
+    async with database(DATABASE) as db:
         await db.execute('''
             CREATE TABLE IF NOT EXISTS user_scores (
                 user_id INTEGER PRIMARY KEY,
@@ -58,11 +244,28 @@ async def init_score_db():
                 num_replies INTEGER NOT NULL
             )
         ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_user_scores_total ON user_scores (total_score DESC)')
+        await db.commit()
+
+        # Build the in-memory leaderboard once; later score updates adjust it in place
+        if not score_leaderboard.loaded:
+            cursor = await db.execute('SELECT user_id, total_score FROM user_scores')
+            score_leaderboard.load(await cursor.fetchall())
+
+        # Per-channel score feedback settings
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS feedback_settings (
+                channel_id INTEGER PRIMARY KEY,
+                mode TEXT NOT NULL
+            )
+        ''')
         await db.commit()
+        cursor = await db.execute('SELECT channel_id, mode FROM feedback_settings')
+        feedback_modes.update(await cursor.fetchall())
 
 # Newsletter database
 async def init_db():
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         await db.execute('''
             CREATE TABLE IF NOT EXISTS newsletters (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,30 +279,60 @@ async def init_db():
 
 @bot.event
 async def on_ready():
+    global startup_complete
+    # on_ready fires again after every reconnect; everything below only needs to run once
+    if startup_complete:
+        print(f'Reconnected as {bot.user}')
+        return
     try:
         await init_db() 
         await init_score_db()
-        scheduler.start()
+        await load_posted_newsletters()
+        await init_pdf_catalog()
+        await summary_cache.init()
+        await score_memo.init()
+        start_scoring_workers()
+        start_question_reaper()
+        start_mail_worker()
+        if not scheduler.running:
+            scheduler.start()
         await load_scheduled_newsletters()
         await check_and_post_newsletter()
-        scheduler.add_job(check_and_post_newsletter, 'interval', hours=24)
+        scheduler.add_job(check_and_post_newsletter, 'interval', hours=24, id='check_and_post_newsletter', replace_existing=True)
+        scheduler.add_job(flush_user_scores, 'interval', seconds=SCORE_FLUSH_INTERVAL, id='flush_user_scores', replace_existing=True)
+        startup_complete = True
         print(f'Logged in as {bot.user}')
     except Exception as e:
         print(f"An error occurred in on_ready: {e}")
 
 async def load_scheduled_newsletters():
-    async with aiosqlite.connect('newsletters.db') as db:
-        cursor = await db.execute('SELECT id, title, content, scheduled_time, channel_id FROM newsletters')
+    # Only newsletters without a job in the persistent jobstore need scheduling,
+    # e.g. rows created before the jobstore existed
+    async with database(NEWSLETTER_DATABASE) as db:
+        cursor = await db.execute('''
+            SELECT id, title, content, scheduled_time, channel_id FROM newsletters
+            WHERE 'newsletter_' || id NOT IN (SELECT id FROM apscheduler_jobs)
+        ''')
         newsletters = await cursor.fetchall()
-        for newsletter in newsletters:
-            schedule_time = datetime.fromisoformat(newsletter[3])
-            scheduler.add_job(
-                post_newsletter,
-                'date',
-                run_date=schedule_time,
-                args=[newsletter[0], newsletter[1], newsletter[2], newsletter[4]],
-                id=f'newsletter_{newsletter[0]}'
-            )
+    for newsletter in newsletters:
+        schedule_newsletter_job(newsletter[0], newsletter[1], newsletter[2], datetime.fromisoformat(newsletter[3]), newsletter[4])
+
+def schedule_newsletter_job(newsletter_id, title, content, schedule_time, channel_id):
+    scheduler.add_job(
+        post_newsletter,
+        'date',
+        run_date=schedule_time,
+        args=[newsletter_id, title, content, channel_id],
+        id=f'newsletter_{newsletter_id}',
+        jobstore='newsletters',
+        replace_existing=True
+    )
+
+def schedule_newsletter_jobs(jobs):
+    # jobs is a list of (newsletter ID, title, content, schedule time, channel ID).
+    # Each add_job is a blocking commit to the SQLAlchemy jobstore, so callers run this in a thread
+    for newsletter_id, title, content, schedule_time, channel_id in jobs:
+        schedule_newsletter_job(newsletter_id, title, content, schedule_time, channel_id)
 
 @bot.command()
 @is_newsletter_manager()
@@ -136,7 +369,7 @@ async def createnewsletter(ctx):
         channel = channel_msg.channel_mentions[0]
 
         # Save newsletter to database and get the newsletter ID
-        async with aiosqlite.connect('newsletters.db') as db:
+        async with database(NEWSLETTER_DATABASE) as db:
             cursor = await db.execute(
                 'INSERT INTO newsletters (title, content, scheduled_time, channel_id) VALUES (?, ?, ?, ?)',
                 (title, content, scheduled_time, channel.id)
@@ -147,24 +380,397 @@ async def createnewsletter(ctx):
             newsletter_id = cursor.lastrowid
 
         # Schedule the newsletter
-        scheduler.add_job(
-            post_newsletter,
-            'date',
-            run_date=schedule_time,
-            args=[newsletter_id, title, content, channel.id],
-            id=f'newsletter_{newsletter_id}'
-        )
+        schedule_newsletter_job(newsletter_id, title, content, schedule_time, channel.id)
 
         await ctx.send(f'Newsletter "{title}" has been scheduled for {scheduled_time} in {channel.mention}. ID: {newsletter_id}')
 
     except asyncio.TimeoutError:
         await ctx.send('You took too long to respond. Please try again.')
 
+# Bulk newsletter import: one attachment, validated as a whole, inserted in one transaction
+NEWSLETTER_IMPORT_MAX_ROWS = 500
+NEWSLETTER_IMPORT_MAX_SIZE = 1024 * 1024
+
+def parse_newsletter_file(filename, data):
+    text = data.decode('utf-8-sig')
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == '.json':
+        rows = json.loads(text)
+    elif extension == '.csv':
+        rows = list(csv.DictReader(io.StringIO(text)))
+    elif extension in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ValueError("YAML imports need PyYAML installed. Please use JSON or CSV instead.")
+        rows = yaml.safe_load(text)
+    else:
+        raise ValueError("The file must be a .json, .csv, .yaml or .yml file.")
+
+    # Accept either a bare list or {"newsletters": [...]}
+    if isinstance(rows, dict):
+        rows = rows.get('newsletters')
+    if not isinstance(rows, list):
+        raise ValueError("The file must contain a list of newsletters.")
+    return rows
+
+def resolve_import_channel(ctx, value):
+    if value is None or str(value).strip() == '':
+        return ctx.channel
+    value = str(value).strip()
+    match = re.fullmatch(r'<#(\d+)>|(\d+)', value)
+    if match:
+        channel = bot.get_channel(int(match.group(1) or match.group(2)))
+        return channel if channel is not None and channel.guild == ctx.guild else None
+    return nextcord.utils.get(ctx.guild.text_channels, name=value.lstrip('#'))
+
+def validate_newsletter_rows(ctx, rows):
+    # Returns (valid newsletters, errors); nothing is imported unless errors is empty
+    newsletters = []
+    errors = []
+    now = datetime.now()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append(f"Row {number}: expected an object with title, content, scheduled_time and channel.")
+            continue
+        title = str(row.get('title') or '').strip()
+        content = str(row.get('content') or '').strip()
+        scheduled_time = str(row.get('scheduled_time') or '').strip()
+        if not title:
+            errors.append(f"Row {number}: missing title.")
+        if not content:
+            errors.append(f"Row {number}: missing content.")
+        try:
+            schedule_time = datetime.fromisoformat(scheduled_time)
+        except ValueError:
+            errors.append(f"Row {number}: invalid scheduled_time `{scheduled_time}`. Please use YYYY-MM-DD HH:MM.")
+            continue
+        if schedule_time.tzinfo is not None:
+            # Times with an offset are converted to the bot's local time, like every other schedule
+            schedule_time = schedule_time.astimezone().replace(tzinfo=None)
+            scheduled_time = schedule_time.isoformat(sep=' ')
+        if schedule_time <= now:
+            errors.append(f"Row {number}: scheduled_time `{scheduled_time}` is in the past.")
+        channel = resolve_import_channel(ctx, row.get('channel', row.get('channel_id')))
+        if channel is None:
+            errors.append(f"Row {number}: channel `{row.get('channel', row.get('channel_id'))}` not found.")
+            continue
+        newsletters.append((title, content, scheduled_time, schedule_time, channel))
+    return newsletters, errors
+
+@bot.command()
+@is_newsletter_manager()
+async def importnewsletters(ctx):
+    attachments = ctx.message.attachments
+    if not attachments:
+        await ctx.send("Please upload a JSON, CSV or YAML file of newsletters as an attachment to this message.")
+
+        def check(m):
+            return m.author == ctx.author and m.channel == ctx.channel and len(m.attachments) > 0
+
+        try:
+            msg = await bot.wait_for('message', timeout=60.0, check=check)
+        except asyncio.TimeoutError:
+            await ctx.send("You took too long to upload the file. Please try again.")
+            return
+        attachments = msg.attachments
+    attachment = attachments[0]
+
+    if attachment.size > NEWSLETTER_IMPORT_MAX_SIZE:
+        await ctx.send("The file is too large. Maximum size is 1 MB.")
+        return
+
+    try:
+        rows = parse_newsletter_file(attachment.filename, await attachment.read())
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        await ctx.send(f"Could not read the file: {e}")
+        return
+    except Exception as e:
+        await ctx.send(f"Could not parse the file: {e}")
+        return
+
+    if not rows:
+        await ctx.send("The file does not contain any newsletters.")
+        return
+    if len(rows) > NEWSLETTER_IMPORT_MAX_ROWS:
+        await ctx.send(f"Too many newsletters. You can import at most {NEWSLETTER_IMPORT_MAX_ROWS} at once.")
+        return
+
+    newsletters, errors = validate_newsletter_rows(ctx, rows)
+    if errors:
+        shown = "\n".join(errors[:10])
+        more = f"\n...and {len(errors) - 10} more." if len(errors) > 10 else ""
+        await ctx.send(f"Nothing was imported. Please fix these problems and try again:\n{shown}{more}")
+        return
+
+    # Insert every newsletter with a single statement. The connection is shared with the rest of
+    # the bot, so a multi-statement transaction could be committed halfway by another coroutine;
+    # one statement is all-or-nothing on its own.
+    placeholders = ', '.join(['(?, ?, ?, ?)'] * len(newsletters))
+    params = []
+    for title, content, scheduled_time, schedule_time, channel in newsletters:
+        params.extend((title, content, scheduled_time, channel.id))
+    async with database(NEWSLETTER_DATABASE) as db:
+        try:
+            cursor = await db.execute(
+                f'INSERT INTO newsletters (title, content, scheduled_time, channel_id) VALUES {placeholders} RETURNING id',
+                params
+            )
+            # Rows of one INSERT get increasing IDs in VALUES order
+            newsletter_ids = sorted(row[0] for row in await cursor.fetchall())
+            await db.commit()
+        except Exception as e:
+            await ctx.send(f"An error occurred while saving the newsletters. Nothing was imported: {e}")
+            return
+
+    # Register all the jobs off the event loop
+    jobs = [
+        (newsletter_id, title, content, schedule_time, channel.id)
+        for newsletter_id, (title, content, scheduled_time, schedule_time, channel) in zip(newsletter_ids, newsletters)
+    ]
+    await asyncio.get_running_loop().run_in_executor(None, schedule_newsletter_jobs, jobs)
+
+    first, last = min(n[3] for n in newsletters), max(n[3] for n in newsletters)
+    await ctx.send(f"Imported and scheduled {len(newsletters)} newsletter(s) between {first.strftime('%Y-%m-%d %H:%M')} and {last.strftime('%Y-%m-%d %H:%M')}. IDs: {newsletter_ids[0]}-{newsletter_ids[-1]}")
+
 def is_pdf_uploader():
     def predicate(ctx):
         return any(role.name == 'PDF Uploader' for role in ctx.author.roles)
     return commands.check(predicate)
 
+# PDF catalog: built once at startup and kept current on upload, so commands never scan the directory
+PDF_DATABASE = 'pdfs.db'
+PDFS_PER_PAGE = 25  # Discord allows at most 25 fields per embed
+
+class PdfRecord:
+    __slots__ = ('filename', 'size', 'sha256', 'uploaded_at', 'uploader_id')
+
+    def __init__(self, filename, size, sha256, uploaded_at, uploader_id=None):
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.uploaded_at = uploaded_at
+        self.uploader_id = uploader_id
+
+    @property
+    def path(self):
+        return pdf_blob_path(self.sha256)
+
+class PdfCatalog:
+    def __init__(self):
+        self.records = {}  # Key: lowercased filename, Value: PdfRecord
+        self.sorted_keys = []  # Lowercased filenames in order, for paging and prefix search
+        self.by_hash = {}  # Key: sha256, Value: set of lowercased filenames sharing that content
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, filename):
+        return filename.lower() in self.records
+
+    def clear(self):
+        self.records.clear()
+        self.sorted_keys.clear()
+        self.by_hash.clear()
+
+    def get(self, filename):
+        return self.records.get(filename.lower())
+
+    def get_by_hash(self, sha256):
+        keys = self.by_hash.get(sha256)
+        if not keys:
+            return None
+        return self.records[next(iter(keys))]
+
+    def refcount(self, sha256):
+        return len(self.by_hash.get(sha256, ()))
+
+    def add(self, record):
+        key = record.filename.lower()
+        if key in self.records:
+            self.remove(record.filename)
+        bisect.insort(self.sorted_keys, key)
+        self.records[key] = record
+        self.by_hash.setdefault(record.sha256, set()).add(key)
+
+    def remove(self, filename):
+        # Returns the removed record, or None if the name was not in the catalog
+        key = filename.lower()
+        record = self.records.pop(key, None)
+        if record is not None:
+            index = bisect.bisect_left(self.sorted_keys, key)
+            del self.sorted_keys[index]
+            keys = self.by_hash[record.sha256]
+            keys.discard(key)
+            if not keys:
+                del self.by_hash[record.sha256]
+        return record
+
+    def page(self, page_number, per_page=PDFS_PER_PAGE):
+        start = (page_number - 1) * per_page
+        return [self.records[key] for key in self.sorted_keys[start:start + per_page]]
+
+    def page_count(self, per_page=PDFS_PER_PAGE):
+        return max(1, -(-len(self.sorted_keys) // per_page))
+
+    def search_prefix(self, prefix, limit=PDFS_PER_PAGE):
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        matches = []
+        for key in self.sorted_keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            matches.append(self.records[key])
+        return matches
+
+    def search(self, query, limit=PDFS_PER_PAGE):
+        # Prefix matches first, then close spellings
+        matches = self.search_prefix(query, limit)
+        seen = {record.filename.lower() for record in matches}
+        if len(matches) < limit:
+            for key in difflib.get_close_matches(query.lower(), self.sorted_keys, n=limit, cutoff=0.6):
+                if key not in seen:
+                    matches.append(self.records[key])
+                    seen.add(key)
+        return matches[:limit]
+
+pdf_catalog = PdfCatalog()
+# Key: sha256, Value: lock held while a blob is stored and recorded, or unrecorded and deleted,
+# so an upload can't reuse a blob that a concurrent delete is about to remove
+pdf_hash_locks = {}
+
+def hash_pdf_file(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def pdf_blob_path(sha256):
+    return os.path.join(PDF_OBJECTS_PATH, sha256[:2], f'{sha256}.pdf')
+
+def store_pdf_blob(temp_path, sha256):
+    # Move a fully written upload into place, or drop it if the content is already stored
+    blob_path = pdf_blob_path(sha256)
+    if os.path.exists(blob_path):
+        os.remove(temp_path)
+        return
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    os.replace(temp_path, blob_path)
+
+def migrate_pdf_directory(catalog_rows):
+    # Runs in a worker thread: move PDFs stored by name into the content-addressed store
+    # and report catalog rows whose content has gone missing
+    known = {row[0]: row for row in catalog_rows}
+    new_records = []
+    for entry in os.scandir(PDF_STORAGE_PATH):
+        if not entry.is_file() or not entry.name.lower().endswith('.pdf'):
+            continue
+        stat = entry.stat()
+        sha256 = hash_pdf_file(entry.path)
+        store_pdf_blob(entry.path, sha256)
+        # Keep the upload details already recorded for this name, if any
+        if entry.name in known:
+            uploaded_at, uploader_id = known[entry.name][3], known[entry.name][4]
+        else:
+            uploaded_at, uploader_id = datetime.fromtimestamp(stat.st_mtime).isoformat(), None
+        new_records.append(PdfRecord(entry.name, stat.st_size, sha256, uploaded_at, uploader_id))
+
+    missing = [row[0] for row in catalog_rows if not os.path.exists(pdf_blob_path(row[2]))]
+    return new_records, missing
+
+async def init_pdf_catalog():
+    async with database(PDF_DATABASE) as db:
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS pdf_catalog (
+                filename TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                uploaded_at TEXT NOT NULL,
+                uploader_id INTEGER
+            )
+        ''')
+        await db.commit()
+        cursor = await db.execute('SELECT filename, size, sha256, uploaded_at, uploader_id FROM pdf_catalog')
+        rows = await cursor.fetchall()
+
+        # Reconcile the stored catalog with the disk once, off the event loop
+        loop = asyncio.get_running_loop()
+        new_records, missing = await loop.run_in_executor(None, migrate_pdf_directory, rows)
+
+        if missing:
+            await db.executemany('DELETE FROM pdf_catalog WHERE filename = ?', [(filename,) for filename in missing])
+        if new_records:
+            await db.executemany(
+                'INSERT OR REPLACE INTO pdf_catalog (filename, size, sha256, uploaded_at, uploader_id) VALUES (?, ?, ?, ?, ?)',
+                [(r.filename, r.size, r.sha256, r.uploaded_at, r.uploader_id) for r in new_records]
+            )
+        await db.commit()
+
+    pdf_catalog.clear()
+    missing = set(missing)
+    for row in rows:
+        if row[0] not in missing:
+            pdf_catalog.add(PdfRecord(*row))
+    for record in new_records:
+        pdf_catalog.add(record)
+
+async def add_pdf_record(record):
+    async with database(PDF_DATABASE) as db:
+        await db.execute(
+            'INSERT OR REPLACE INTO pdf_catalog (filename, size, sha256, uploaded_at, uploader_id) VALUES (?, ?, ?, ?, ?)',
+            (record.filename, record.size, record.sha256, record.uploaded_at, record.uploader_id)
+        )
+        await db.commit()
+    pdf_catalog.add(record)
+
+async def remove_pdf_record(filename):
+    record = pdf_catalog.get(filename)
+    if record is None:
+        return None
+    async with pdf_hash_locks.setdefault(record.sha256, asyncio.Lock()):
+        # Another delete of the same name may have finished while we waited
+        if pdf_catalog.get(filename) is not record:
+            return None
+        async with database(PDF_DATABASE) as db:
+            await db.execute('DELETE FROM pdf_catalog WHERE filename = ?', (record.filename,))
+            await db.commit()
+        pdf_catalog.remove(filename)
+
+        # Only delete the stored content once no other name refers to it
+        if pdf_catalog.refcount(record.sha256) == 0:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, os.remove, record.path)
+            except FileNotFoundError:
+                pass
+    return record
+
+async def download_pdf_attachment(attachment, temp_path):
+    # Stream the attachment to disk, hashing it as the chunks arrive
+    sha256 = hashlib.sha256()
+    size = 0
+    session = await get_http_session()
+    async with session.get(attachment.url, timeout=aiohttp.ClientTimeout(total=120)) as response:
+        response.raise_for_status()
+        with open(temp_path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > PDF_MAX_SIZE:
+                    raise ValueError("The file is too large. Maximum size is 8 MB.")
+                sha256.update(chunk)
+                f.write(chunk)
+    return sha256.hexdigest(), size
+
+def format_pdf_size(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{max(size // 1024, 1)} KB"
+
+def pdf_suggestions(filename):
+    matches = pdf_catalog.search(filename, limit=3)
+    if not matches:
+        return ""
+    return " Did you mean: " + ", ".join(f"`{record.filename}`" for record in matches) + "?"
+
 @bot.command()
 @is_pdf_uploader()
 async def uploadpdf(ctx):
@@ -183,38 +789,83 @@ async def uploadpdf(ctx):
             return
 
         # Limit file size (e.g., max 8 MB)
-        if attachment.size > 8 * 1024 * 1024:
+        if attachment.size > PDF_MAX_SIZE:
             await ctx.send("The file is too large. Maximum size is 8 MB.")
             return
 
         # Sanitize filename
         safe_filename = os.path.basename(attachment.filename)
 
-        file_path = os.path.join(PDF_STORAGE_PATH, safe_filename)
-
-        if os.path.exists(file_path):
+        if safe_filename in pdf_catalog:
             await ctx.send("A file with that name already exists. Please rename your file and try again.")
             return
 
-        # Save the PDF
-        await attachment.save(file_path)
-
-        await ctx.send(f"PDF `{safe_filename}` has been uploaded successfully.")
+        # Download into a temporary file, then file it under its content hash
+        temp_path = os.path.join(PDF_OBJECTS_PATH, f'.upload-{attachment.id}.tmp')
+        try:
+            try:
+                sha256, size = await download_pdf_attachment(attachment, temp_path)
+            except (ValueError, aiohttp.ClientError) as e:
+                await ctx.send(f"Could not save the PDF: {e}")
+                return
+            except asyncio.TimeoutError:
+                # The download hit the HTTP session's timeout; not the user's upload prompt
+                await ctx.send("Downloading the PDF from Discord timed out. Please try again.")
+                return
+
+            # Hold the hash lock until the record is in the catalog, so a delete of another
+            # name with the same content can't remove the blob in between
+            async with pdf_hash_locks.setdefault(sha256, asyncio.Lock()):
+                duplicate = pdf_catalog.get_by_hash(sha256)
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, store_pdf_blob, temp_path, sha256)
+                record = PdfRecord(safe_filename, size, sha256, datetime.now().isoformat(), ctx.author.id)
+                await add_pdf_record(record)
+        finally:
+            # store_pdf_blob moves or removes the file; anything left here is a failed upload
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if duplicate is not None:
+            await ctx.send(f"PDF `{safe_filename}` has been uploaded successfully. It is identical to `{duplicate.filename}`, so no extra space was used.")
+        else:
+            await ctx.send(f"PDF `{safe_filename}` has been uploaded successfully.")
 
     except asyncio.TimeoutError:
         await ctx.send("You took too long to upload the PDF. Please try again.")
 
 @bot.command()
-async def listpdfs(ctx):
-    pdf_files = [f for f in os.listdir(PDF_STORAGE_PATH) if f.endswith('.pdf')]
-
-    if not pdf_files:
+async def listpdfs(ctx, page: int = 1):
+    if not pdf_catalog:
         await ctx.send("No PDFs are currently stored.")
         return
 
+    page_count = pdf_catalog.page_count()
+    if page < 1 or page > page_count:
+        await ctx.send(f"Page {page} does not exist. There are {page_count} page(s) of PDFs.")
+        return
+
     embed = nextcord.Embed(title="Stored PDFs", color=nextcord.Color.blue())
-    for pdf in pdf_files:
-        embed.add_field(name=pdf, value="Use `!getpdf <filename>` to download.", inline=False)
+    for record in pdf_catalog.page(page):
+        embed.add_field(name=record.filename, value=f"{format_pdf_size(record.size)} · uploaded {record.uploaded_at[:10]}", inline=False)
+    embed.set_footer(text=f"Page {page}/{page_count} · Use `!getpdf <filename>` to download.")
+
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def searchpdfs(ctx, *, query: str = None):
+    if query is None:
+        await ctx.send("Please specify what to search for. Usage: `!searchpdfs <query>`")
+        return
+
+    matches = pdf_catalog.search(query)
+    if not matches:
+        await ctx.send(f"No PDFs match `{query}`.")
+        return
+
+    embed = nextcord.Embed(title=f"PDFs matching \"{query}\"", color=nextcord.Color.blue())
+    for record in matches:
+        embed.add_field(name=record.filename, value=f"{format_pdf_size(record.size)} · uploaded {record.uploaded_at[:10]}", inline=False)
 
     await ctx.send(embed=embed)
 
@@ -225,19 +876,34 @@ async def getpdf(ctx, *, filename: str = None):
         return
 
     safe_filename = os.path.basename(filename)
-    file_path = os.path.join(PDF_STORAGE_PATH, safe_filename)
+    record = pdf_catalog.get(safe_filename)
 
-    if not os.path.exists(file_path):
-        await ctx.send(f"PDF `{safe_filename}` not found.")
+    if record is None:
+        await ctx.send(f"PDF `{safe_filename}` not found.{pdf_suggestions(safe_filename)}")
         return
 
-    await ctx.send(file=nextcord.File(file_path))
+    await ctx.send(file=nextcord.File(record.path, filename=record.filename))
+
+@bot.command()
+@is_pdf_uploader()
+async def deletepdf(ctx, *, filename: str = None):
+    if filename is None:
+        await ctx.send("Please specify the filename. Usage: `!deletepdf <filename>`")
+        return
+
+    safe_filename = os.path.basename(filename)
+    record = await remove_pdf_record(safe_filename)
+    if record is None:
+        await ctx.send(f"PDF `{safe_filename}` not found.{pdf_suggestions(safe_filename)}")
+        return
+
+    await ctx.send(f"PDF `{record.filename}` has been deleted.")
 
 @bot.command()
 @is_newsletter_manager()
 async def editnewsletter(ctx, newsletter_id: int):
     # Fetch the newsletter from the database
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         cursor = await db.execute('SELECT title, content, scheduled_time, channel_id FROM newsletters WHERE id = ?', (newsletter_id,))
         newsletter = await cursor.fetchone()
 
@@ -283,29 +949,22 @@ async def editnewsletter(ctx, newsletter_id: int):
         new_channel_id = channel_msg.channel_mentions[0].id
 
     # Update the database
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         await db.execute(
             'UPDATE newsletters SET title = ?, content = ?, scheduled_time = ?, channel_id = ? WHERE id = ?',
             (new_title, new_content, new_scheduled_time, new_channel_id, newsletter_id)
         )
         await db.commit()
 
-    # Reschedule the newsletter
-    scheduler.remove_job(f'newsletter_{newsletter_id}')
-    scheduler.add_job(
-        post_newsletter,
-        'date',
-        run_date=schedule_time,
-        args=[newsletter_id, new_title, new_content, new_channel_id],
-        id=f'newsletter_{newsletter_id}'
-    )
+    # Reschedule the newsletter, replacing its existing job
+    schedule_newsletter_job(newsletter_id, new_title, new_content, schedule_time, new_channel_id)
 
     await ctx.send(f'Newsletter ID {newsletter_id} has been updated.')
 
 @bot.command()
 @is_newsletter_manager()
 async def schedulenewsletter(ctx):
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         cursor = await db.execute('SELECT id, title, scheduled_time, channel_id FROM newsletters')
         newsletters = await cursor.fetchall()
 
@@ -327,10 +986,17 @@ async def post_newsletter(newsletter_id, title, content, channel_id):
         return
 
     embed = nextcord.Embed(title=title, description=content)
-    await channel.send(embed=embed)
+    message = await outbound.send(channel, embed=embed, priority=PRIORITY_NEWSLETTER)
+    if message is None:
+        # The dispatcher already logged the error; keep the row and try again later
+        retry_time = datetime.now() + NEWSLETTER_RETRY_DELAY
+        print(f'Newsletter "{title}" could not be posted in {channel.name}; retrying at {retry_time}.')
+        job = (newsletter_id, title, content, retry_time, channel_id)
+        await asyncio.get_running_loop().run_in_executor(None, schedule_newsletter_jobs, [job])
+        return
 
     # Remove the newsletter from the database
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         await db.execute('DELETE FROM newsletters WHERE id = ?', (newsletter_id,))
         await db.commit()
 
@@ -348,14 +1014,12 @@ async def cleardatabase(ctx):
         confirmation = await bot.wait_for('message', timeout=30.0, check=check)
         if confirmation.content.strip().upper() == 'YES':
             # Proceed to clear the database
-            async with aiosqlite.connect('newsletters.db') as db:
+            async with database(NEWSLETTER_DATABASE) as db:
                 await db.execute('DELETE FROM newsletters')
                 await db.commit()
 
             # Remove all scheduled newsletter jobs
-            for job in scheduler.get_jobs():
-                if job.id.startswith('newsletter_'):
-                    scheduler.remove_job(job.id)
+            scheduler.remove_all_jobs(jobstore='newsletters')
 
             await ctx.send("✅ All entries in the newsletter database have been deleted, and scheduled newsletters have been canceled.")
         else:
@@ -366,7 +1030,7 @@ async def cleardatabase(ctx):
 @bot.command()
 @is_newsletter_manager()
 async def listnewsletters(ctx):
-    async with aiosqlite.connect('newsletters.db') as db:
+    async with database(NEWSLETTER_DATABASE) as db:
         cursor = await db.execute('SELECT id, title, scheduled_time, channel_id FROM newsletters')
         newsletters = await cursor.fetchall()
 
@@ -416,6 +1080,12 @@ async def help(ctx):
             'description': 'Creates and schedules a new newsletter. You will be prompted to enter the title, content, scheduled time, and channel.',
             'permissions': 'Requires the **Newsletter Manager** role.'
         },
+        {
+            'name': '!importnewsletters',
+            'usage': '!importnewsletters (attach a .json, .csv or .yaml file)',
+            'description': 'Schedules many newsletters at once. Each entry needs a title, content, scheduled_time (YYYY-MM-DD HH:MM) and channel (mention, ID or name; defaults to the current channel).',
+            'permissions': 'Requires the **Newsletter Manager** role.'
+        },
         {
             'name': '!editnewsletter',
             'usage': '!editnewsletter <newsletter_id>',
@@ -446,6 +1116,12 @@ async def help(ctx):
             'description': 'Emails the specified PDFs to the given email address.',
             'permissions': 'Requires the **PDF Uploader** role.'
         },
+        {
+            'name': '!summarize',
+            'usage': '!summarize [message_count]',
+            'description': 'Summarizes the conversation in this channel. Later runs only read messages posted since the last summary.',
+            'permissions': 'Available to all users.'
+        },
         {
             'name': '!help',
             'usage': '!help',
@@ -460,10 +1136,22 @@ async def help(ctx):
         },
         {
             'name': '!listpdfs',
-            'usage': '!listpdfs',
-            'description': 'Lists all stored PDFs.',
+            'usage': '!listpdfs [page]',
+            'description': 'Lists stored PDFs, 25 per page.',
             'permissions': 'Available to all users.'  # Adjust if you add permissions
         },
+        {
+            'name': '!deletepdf',
+            'usage': '!deletepdf <filename>',
+            'description': 'Deletes a stored PDF.',
+            'permissions': 'Requires the **PDF Uploader** role.'
+        },
+        {
+            'name': '!searchpdfs',
+            'usage': '!searchpdfs <query>',
+            'description': 'Finds stored PDFs by name prefix or close spelling.',
+            'permissions': 'Available to all users.'
+        },
         {
             'name': '!getpdf',
             'usage': '!getpdf <filename>',
@@ -484,8 +1172,20 @@ async def help(ctx):
         },
         {
             'name': '!leaderboard',
-            'usage': '!leaderboard',
-            'description': 'Shows the top 10 users with the highest helpfulness scores.',
+            'usage': '!leaderboard [page]',
+            'description': 'Shows the users with the highest helpfulness scores, 10 per page.',
+            'permissions': 'Available to all users.'
+        },
+        {
+            'name': '!scorefeedback',
+            'usage': '!scorefeedback [embed|reaction|message|off]',
+            'description': 'Shows or sets how helpfulness scores are announced in this channel. `embed` collects scores into one message every 30 seconds.',
+            'permissions': 'Requires the **Newsletter Manager** role.'
+        },
+        {
+            'name': '!rank',
+            'usage': '!rank [@user]',
+            'description': 'Shows your leaderboard rank, or the rank of the mentioned user.',
             'permissions': 'Available to all users.'
         },
         # Include these if you implemented opt-in/out functionality
@@ -533,26 +1233,115 @@ async def help(ctx):
 # Database file for tracking posted newsletters
 DATABASE = 'newsletters_posted.db'
 
-def get_latest_newsletter():
-    feed_url = 'https://www.deeplearning.ai/the-batch/feed/'
-    feed = feedparser.parse(feed_url)
-    if feed.entries:
-        latest_entry = feed.entries[0]
-        return latest_entry
-    else:
-        return None
-
-async def is_newsletter_posted(newsletter_id):
-    async with aiosqlite.connect(DATABASE) as db:
+# Feeds to poll, mapped to the author name shown on their embeds
+NEWSLETTER_FEEDS = {
+    'https://www.deeplearning.ai/the-batch/feed/': 'Deeplearning.ai Newsletter',
+}
+NEWSLETTER_MAX_POSTS_PER_POLL = 5  # Per feed; older unseen entries are marked as posted without posting
+FEED_TIMEOUT = 30  # Seconds allowed for a single feed request
+
+http_session = None
+feed_validators = {}  # Key: feed URL, Value: ETag, Last-Modified and body digest from the last fetch
+
+async def get_http_session():
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FEED_TIMEOUT))
+    return http_session
+
+async def fetch_feed_entries(feed_url):
+    # Conditional GET: the server answers 304 when nothing changed since the last poll
+    validators = feed_validators.get(feed_url, {})
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    session = await get_http_session()
+    async with session.get(feed_url, headers=headers) as response:
+        if response.status == 304:
+            return []
+        response.raise_for_status()
+        body = await response.read()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+    # Some servers ignore the validators, so skip parsing when the body is unchanged
+    digest = hashlib.sha256(body).hexdigest()
+    if digest == validators.get('digest'):
+        return []
+    feed_validators[feed_url] = {'etag': etag, 'last_modified': last_modified, 'digest': digest}
+
+    # Parsing is CPU-bound, so keep it off the event loop
+    loop = asyncio.get_running_loop()
+    feed = await loop.run_in_executor(None, feedparser.parse, body)
+    return feed.entries
+
+async def get_new_newsletter_entries():
+    # Poll every feed concurrently and return (author name, entries) per feed, entries newest first
+    feed_urls = list(NEWSLETTER_FEEDS)
+    results = await asyncio.gather(*(fetch_feed_entries(url) for url in feed_urls), return_exceptions=True)
+    feeds = []
+    for feed_url, result in zip(feed_urls, results):
+        if isinstance(result, Exception):
+            print(f"An error occurred while fetching {feed_url}: {result}")
+            # Forget the validators so the next poll fetches the full feed
+            feed_validators.pop(feed_url, None)
+            continue
+        if result:
+            feeds.append((NEWSLETTER_FEEDS[feed_url], result))
+    return feeds
+
+def select_entries_to_post(entries):
+    # Feeds list newest first, using the link as a unique identifier. Only entries newer than
+    # the newest one already posted are new; older ones are back catalog. A feed with no posted
+    # entries yet (new feed, or first run) only posts its newest entry.
+    entries = [entry for entry in entries if entry.get('link')]
+    newest_posted = next((i for i, entry in enumerate(entries) if is_newsletter_posted(entry.link)), None)
+    fresh = entries[:1] if newest_posted is None else entries[:newest_posted]
+    to_post = fresh[:NEWSLETTER_MAX_POSTS_PER_POLL]
+
+    # Everything else is recorded as posted so it never shows up again
+    posting = {entry.link for entry in to_post}
+    for entry in entries:
+        if entry.link not in posting:
+            mark_newsletter_as_posted(entry.link)
+    return to_post
+
+# Posted IDs are kept in memory; new ones are written back in one batch per poll
+posted_newsletter_ids = set()
+unsaved_posted_ids = []
+
+async def load_posted_newsletters():
+    async with database(DATABASE) as db:
         await db.execute('CREATE TABLE IF NOT EXISTS posted_newsletters (id TEXT PRIMARY KEY)')
-        cursor = await db.execute('SELECT id FROM posted_newsletters WHERE id = ?', (newsletter_id,))
-        result = await cursor.fetchone()
-        return result is not None
-
-async def mark_newsletter_as_posted(newsletter_id):
-    async with aiosqlite.connect(DATABASE) as db:
-        await db.execute('INSERT INTO posted_newsletters (id) VALUES (?)', (newsletter_id,))
         await db.commit()
+        cursor = await db.execute('SELECT id FROM posted_newsletters')
+        rows = await cursor.fetchall()
+    posted_newsletter_ids.update(row[0] for row in rows)
+
+def is_newsletter_posted(newsletter_id):
+    return newsletter_id in posted_newsletter_ids
+
+def mark_newsletter_as_posted(newsletter_id):
+    if newsletter_id not in posted_newsletter_ids:
+        posted_newsletter_ids.add(newsletter_id)
+        unsaved_posted_ids.append(newsletter_id)
+
+async def save_posted_newsletters():
+    if not unsaved_posted_ids:
+        return
+    batch = [(newsletter_id,) for newsletter_id in unsaved_posted_ids]
+    unsaved_posted_ids.clear()
+    try:
+        async with database(DATABASE) as db:
+            await db.executemany('INSERT OR IGNORE INTO posted_newsletters (id) VALUES (?)', batch)
+            await db.commit()
+    except Exception as e:
+        print(f"An error occurred while saving posted newsletters: {e}")
+        # Keep the IDs queued so the next poll retries the write
+        unsaved_posted_ids.extend(row[0] for row in batch)
 
 async def check_and_post_newsletter():
     channel_id = 1291424889655394537  # Replace with your Discord channel ID
@@ -568,33 +1357,38 @@ async def check_and_post_newsletter():
         print(f"An HTTP exception occurred: {e}")
         return
     
-    latest_newsletter = get_latest_newsletter()
-    if latest_newsletter is None:
-        print("No newsletter entries found.")
+    feeds = await get_new_newsletter_entries()
+    if not feeds:
+        print("No new newsletter entries found.")
         return
 
-    # Use the link as a unique identifier
-    newsletter_id = latest_newsletter.link
-    already_posted = await is_newsletter_posted(newsletter_id)
-    if not already_posted:
+    # Each feed posts its own new entries, oldest first
+    to_post = []
+    for author, entries in feeds:
+        to_post.extend((author, entry) for entry in reversed(select_entries_to_post(entries)))
+
+    for author, entry in to_post:
         # Mark newsletter as posted
-        await mark_newsletter_as_posted(newsletter_id)
-        
+        mark_newsletter_as_posted(entry.link)
+
         # Prepare the embed
-        title = latest_newsletter.title
-        link = latest_newsletter.link
-        summary = latest_newsletter.summary  # May contain HTML tags
+        title = entry.get('title', 'Untitled')
+        link = entry.link
+        summary = entry.get('summary', '')  # May contain HTML tags
 
         # Remove HTML tags from summary
-        clean_summary = re.sub('<[^<]+?>', '', summary)
+        clean_summary = re.sub('<[^<]+?>', '', summary)[:4096]
 
         # Create an embed message
         embed = nextcord.Embed(title=title, url=link, description=clean_summary, color=nextcord.Color.blue())
-        embed.set_author(name='Deeplearning.ai Newsletter')
+        embed.set_author(name=author)
         embed.set_footer(text='Stay tuned for more updates!')
 
-        await channel.send(embed=embed)
-    else:
+        await outbound.send(channel, embed=embed, priority=PRIORITY_NEWSLETTER)
+
+    await save_posted_newsletters()
+
+    if not to_post:
         print("Newsletter has already been posted.")
 
 
@@ -617,44 +1411,104 @@ async def emailpdf(ctx, email_address: str, *, filenames: str):
     files_to_send = []
     for filename in requested_files:
         safe_filename = os.path.basename(filename)
-        file_path = os.path.join(PDF_STORAGE_PATH, safe_filename)
-        if not os.path.exists(file_path):
-            await ctx.send(f"PDF `{safe_filename}` not found.")
+        record = pdf_catalog.get(safe_filename)
+        if record is None:
+            await ctx.send(f"PDF `{safe_filename}` not found.{pdf_suggestions(safe_filename)}")
             return
-        files_to_send.append(file_path)
+        files_to_send.append((record.path, record.filename))
+
+    # Hand the email to the mail worker; the result is reported back in this channel
+    await mail_queue.put((ctx, email_address, files_to_send))
+    await ctx.send(f"Email to `{email_address}` has been queued. I'll post here once it has been sent.")
 
-    # Email configuration
+# Outbound mail: emailpdf queues jobs and one worker sends them from a background thread
+mail_queue = asyncio.Queue()
+mail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='smtp')
+mail_task = None
+smtp_session = None  # Authenticated SMTP connection, only touched from the mail thread
+
+def open_smtp_session():
     smtp_server = os.getenv('SMTP_SERVER')
     smtp_port = int(os.getenv('SMTP_PORT', 587))
     smtp_username = os.getenv('SMTP_USERNAME')
     smtp_password = os.getenv('SMTP_PASSWORD')
-    email_from = os.getenv('EMAIL_FROM_ADDRESS')
-    email_to = email_address
 
+    context = ssl.create_default_context()
+    server = smtplib.SMTP(smtp_server, smtp_port, timeout=60)
+    try:
+        server.starttls(context=context)
+        server.login(smtp_username, smtp_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def close_smtp_session():
+    global smtp_session
+    if smtp_session is not None:
+        try:
+            smtp_session.quit()
+        except Exception:
+            smtp_session.close()
+        smtp_session = None
+
+def build_pdf_email(email_to, files_to_send):
     # Create the email message
     msg = EmailMessage()
     msg['Subject'] = 'Requested PDFs from Discord Bot'
-    msg['From'] = email_from
+    msg['From'] = os.getenv('EMAIL_FROM_ADDRESS')
     msg['To'] = email_to
     msg.set_content(f"Hello,\n\nPlease find the requested PDFs attached.\n\nBest regards,\nYour Discord Bot")
 
     # Attach PDFs
-    for file_path in files_to_send:
+    for file_path, file_name in files_to_send:
         with open(file_path, 'rb') as f:
             file_data = f.read()
-            file_name = os.path.basename(file_path)
         msg.add_attachment(file_data, maintype='application', subtype='pdf', filename=file_name)
+    return msg
+
+def send_pdf_email(email_to, files_to_send):
+    # Runs on the mail thread, so blocking file reads and SMTP calls are fine here
+    global smtp_session
+    msg = build_pdf_email(email_to, files_to_send)
+    for attempt in range(2):
+        if smtp_session is None:
+            smtp_session = open_smtp_session()
+        try:
+            smtp_session.send_message(msg)
+            return
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+            # The server dropped the idle session, or answered 421 because it is closing it
+            # (smtplib has already closed its end then); reconnect once and retry
+            if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code != 421:
+                raise
+            smtp_session = None
+            if attempt == 1:
+                raise
+
+def start_mail_worker():
+    global mail_task
+    if mail_task is None or mail_task.done():
+        mail_task = bot.loop.create_task(mail_worker())
+
+async def mail_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        ctx, email_to, files_to_send = await mail_queue.get()
+        try:
+            await loop.run_in_executor(mail_executor, send_pdf_email, email_to, files_to_send)
+            outbound.send(ctx.channel, f"{ctx.author.mention}, email sent successfully to `{email_to}`.")
+        except Exception as e:
+            outbound.send(ctx.channel, f"{ctx.author.mention}, an error occurred while sending the email to `{email_to}`: {e}")
+        finally:
+            mail_queue.task_done()
 
-    # Send the email
-    try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls(context=context)
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        await ctx.send(f"Email sent successfully to `{email_to}`.")
-    except Exception as e:
-        await ctx.send(f"An error occurred while sending the email: {e}")
+async def stop_mail_worker():
+    if mail_task is not None:
+        mail_task.cancel()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(mail_executor, close_smtp_session)
+    mail_executor.shutdown(wait=False)
 
 
 
@@ -707,7 +1561,113 @@ async def roast_error(ctx, error):
     elif isinstance(error, MissingRole):
         await ctx.send("You don't have permission to use this command.")
 
-question_messages = {}  # Key: Message ID of the question, Value: List of reply Message objects
+QUESTION_TRACK_SECONDS = 2 * 60 * 60  # Stop tracking a question after 2 hours
+QUESTION_REGISTRY_MAX_SIZE = 5000  # Least recently used questions are evicted past this
+QUESTION_MAX_REPLIES = 50  # Only the most recent replies are kept per question
+QUESTION_REAPER_INTERVAL = 60  # Longest the reaper sleeps between sweeps
+
+# Compact records so the registry never pins full nextcord Message objects
+class TrackedReply:
+    __slots__ = ('message_id', 'author_id', 'created_at')
+
+    def __init__(self, message_id, author_id, created_at):
+        self.message_id = message_id
+        self.author_id = author_id
+        self.created_at = created_at
+
+class TrackedQuestion:
+    __slots__ = ('question_id', 'author_id', 'created_at', 'expires_at', 'replies')
+
+    def __init__(self, question_id, author_id, created_at, expires_at):
+        self.question_id = question_id
+        self.author_id = author_id
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.replies = deque(maxlen=QUESTION_MAX_REPLIES)
+
+class QuestionRegistry:
+    def __init__(self, max_size=QUESTION_REGISTRY_MAX_SIZE, ttl=QUESTION_TRACK_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.questions = OrderedDict()  # Key: question message ID, least recently used first
+        self.expiry_heap = []  # (expiry time, question message ID), earliest expiry first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __contains__(self, question_id):
+        record = self.questions.get(question_id)
+        return record is not None and record.expires_at > time.monotonic()
+
+    def track(self, message):
+        now = time.monotonic()
+        record = self.questions.get(message.id)
+        if record is not None:
+            self.questions.move_to_end(message.id)
+            return record
+
+        # Evict the least recently used questions to stay under the cap
+        while len(self.questions) >= self.max_size:
+            self.questions.popitem(last=False)
+            self.evictions += 1
+
+        record = TrackedQuestion(message.id, message.author.id, now, now + self.ttl)
+        self.questions[message.id] = record
+        heapq.heappush(self.expiry_heap, (record.expires_at, message.id))
+
+        # Drop heap entries left behind by evicted questions once they pile up
+        if len(self.expiry_heap) > 2 * self.max_size:
+            self.expiry_heap = [(r.expires_at, r.question_id) for r in self.questions.values()]
+            heapq.heapify(self.expiry_heap)
+        return record
+
+    def get(self, question_id):
+        record = self.questions.get(question_id)
+        if record is None or record.expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        self.questions.move_to_end(question_id)
+        self.hits += 1
+        return record
+
+    def add_reply(self, question_id, message):
+        record = self.get(question_id)
+        if record is None:
+            return None
+        record.replies.append(TrackedReply(message.id, message.author.id, time.monotonic()))
+        return record
+
+    def expire(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        expired = 0
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            expires_at, question_id = heapq.heappop(self.expiry_heap)
+            record = self.questions.get(question_id)
+            # Skip entries for questions that were already evicted
+            if record is not None and record.expires_at == expires_at:
+                del self.questions[question_id]
+                expired += 1
+        self.expirations += expired
+        return expired
+
+    def next_expiry(self):
+        return self.expiry_heap[0][0] if self.expiry_heap else None
+
+    def stats(self):
+        return {
+            'size': len(self.questions),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+question_registry = QuestionRegistry()
 
 def is_question(content):
     content_lower = content.lower()
@@ -721,25 +1681,226 @@ def is_question(content):
 
     return False
 
-async def track_question(question_message):
-    # Store the question for monitoring
-    question_messages[question_message.id] = []
+question_reaper_task = None
+
+def track_question(question_message):
+    # Store the question for monitoring; the reaper drops it once it expires
+    question_registry.track(question_message)
 
-    # Stop tracking after 2 hours
-    await asyncio.sleep(2 * 60 * 60)
-    if question_message.id in question_messages:
-        del question_messages[question_message.id]
+def start_question_reaper():
+    global question_reaper_task
+    if question_reaper_task is None or question_reaper_task.done():
+        question_reaper_task = bot.loop.create_task(reap_expired_questions())
+
+async def reap_expired_questions():
+    while True:
+        now = time.monotonic()
+        if question_registry.expire(now):
+            print(f"Question registry stats: {question_registry.stats()}")
+
+        # Sleep until the next question expires, but wake up regularly regardless
+        next_expiry = question_registry.next_expiry()
+        if next_expiry is not None:
+            delay = min(next_expiry - now, QUESTION_REAPER_INTERVAL)
+        else:
+            delay = QUESTION_REAPER_INTERVAL
+        await asyncio.sleep(max(delay, 0))
 
 async def check_for_reply(message):
     if message.reference and message.reference.message_id:
         replied_message_id = message.reference.message_id
 
-        if replied_message_id in question_messages:
-            # Add the reply to the list of replies for that question
-            question_messages[replied_message_id].append(message)
+        # Record the reply against the question it answers, if still tracked
+        if question_registry.add_reply(replied_message_id, message) is not None:
+            # Queue the reply for scoring; the workers pick it up in the background
+            try:
+                scoring_queue.put_nowait(message)
+            except asyncio.QueueFull:
+                print(f"Scoring queue is full, skipping reply {message.id}.")
+
+# Local pre-filter: obvious low-value replies get a fixed score without an API call
+PREFILTER_EMOJI_SCORE = 1
+PREFILTER_ACK_SCORE = 1
+PREFILTER_SHORT_SCORE = 2
+PREFILTER_LOG_EVERY = 100  # Print hit rates after this many classified replies
+# Replies made only of these tokens are acknowledgements, not answers ("thanks!", "ok lol")
+ACKNOWLEDGEMENTS = {
+    'thanks', 'thank', 'thx', 'ty', 'tysm', 'tyvm', 'ok', 'okay', 'k', 'kk',
+    'lol', 'lmao', 'haha', 'nice', 'cool', 'awesome', 'agreed', 'gg', 'np', 'ikr',
+}
+
+MENTION_PATTERN = re.compile(r'<(?:@[!&]?|#)\d+>|<a?:\w+:\d+>')  # Mentions, channels, custom emoji
+CODE_PATTERN = re.compile(r'```|`[^`\n]+`')
+LINK_PATTERN = re.compile(r'https?://\S+')
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+class ReplyPrefilter:
+    def __init__(self):
+        self.counts = {'emoji': 0, 'acknowledgement': 0, 'short': 0, 'llm': 0}
+
+    def classify(self, message):
+        # Returns a fixed score for obvious low-value replies, or None if the LLM should decide
+        reason = self.reason(message)
+        self.counts[reason] += 1
+        if sum(self.counts.values()) % PREFILTER_LOG_EVERY == 0:
+            print(f"Reply pre-filter stats: {self.stats()}")
+        if reason == 'emoji':
+            return PREFILTER_EMOJI_SCORE
+        if reason == 'acknowledgement':
+            return PREFILTER_ACK_SCORE
+        if reason == 'short':
+            return PREFILTER_SHORT_SCORE
+        return None
+
+    def reason(self, message):
+        content = message.content
+        # Code, links and attachments can carry a real answer in very few words
+        if message.attachments or CODE_PATTERN.search(content) or LINK_PATTERN.search(content):
+            return 'llm'
+
+        text = MENTION_PATTERN.sub(' ', content).lower()
+        words = WORD_PATTERN.findall(re.sub(r'\bthank you\b', 'thanks', text))
+        if not words:
+            return 'emoji'
+        if all(word.strip("'") in ACKNOWLEDGEMENTS for word in words):
+            return 'acknowledgement'
+        # A lone word is never a useful answer; anything longer may be ("pip install torch")
+        if len(words) == 1:
+            return 'short'
+        return 'llm'
+
+    def stats(self):
+        total = sum(self.counts.values())
+        filtered = total - self.counts['llm']
+        return {
+            **self.counts,
+            'total': total,
+            'hit_rate': round(filtered / total, 3) if total else 0.0,
+        }
+
+reply_prefilter = ReplyPrefilter()
+
+# Memoized scores: identical (question, reply) pairs are only ever sent to OpenAI once
+SCORE_MEMO_SIZE = 5000  # Pairs kept in memory; least recently used are evicted
+SCORE_MEMO_DATABASE = 'score_memo.db'  # Set to None to keep the memo in memory only
+SCORE_MEMO_LOG_EVERY = 100  # Print memo stats after this many lookups
+
+class ScoreMemo:
+    def __init__(self, max_size=SCORE_MEMO_SIZE, db_path=SCORE_MEMO_DATABASE):
+        self.max_size = max_size
+        self.db_path = db_path
+        self.entries = OrderedDict()  # Key: content hash, Value: score, least recently used first
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def init(self):
+        if self.db_path is None:
+            return
+        async with database(self.db_path) as db:
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS score_memo (
+                    content_hash TEXT PRIMARY KEY,
+                    score INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            await db.commit()
+
+    @staticmethod
+    def key(question_text, reply_text):
+        # Case and whitespace differences don't change the answer, so they don't change the key
+        question = ' '.join(question_text.casefold().split())
+        reply = ' '.join(reply_text.casefold().split())
+        return hashlib.sha256(f"{question}\0{reply}".encode('utf-8')).hexdigest()
+
+    def remember(self, content_hash, score):
+        self.entries[content_hash] = score
+        self.entries.move_to_end(content_hash)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, question_message, reply_message):
+        content_hash = self.key(question_message.content, reply_message.content)
+        score = self.entries.get(content_hash)
+        if score is not None:
+            self.entries.move_to_end(content_hash)
+            self.memory_hits += 1
+        elif self.db_path is not None:
+            async with database(self.db_path) as db:
+                cursor = await db.execute('SELECT score FROM score_memo WHERE content_hash = ?', (content_hash,))
+                row = await cursor.fetchone()
+            if row is not None:
+                score = row[0]
+                self.remember(content_hash, score)
+                self.db_hits += 1
+
+        if score is None:
+            self.misses += 1
+        if (self.memory_hits + self.db_hits + self.misses) % SCORE_MEMO_LOG_EVERY == 0:
+            print(f"Score memo stats: {self.stats()}")
+        return score
+
+    async def put_many(self, question_message, scored_replies):
+        # scored_replies is a list of (reply message, score) from one batch, written in one transaction
+        rows = []
+        now = time.time()
+        for reply_message, score in scored_replies:
+            content_hash = self.key(question_message.content, reply_message.content)
+            self.remember(content_hash, score)
+            rows.append((content_hash, score, now))
+        if self.db_path is not None and rows:
+            async with database(self.db_path) as db:
+                await db.executemany('''
+                    INSERT INTO score_memo (content_hash, score, created_at) VALUES (?, ?, ?)
+                    ON CONFLICT(content_hash) DO UPDATE SET score = excluded.score, created_at = excluded.created_at
+                ''', rows)
+                await db.commit()
+
+    def stats(self):
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            'size': len(self.entries),
+            'memory_hits': self.memory_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+score_memo = ScoreMemo()
+
+# Reply scoring pipeline: check_for_reply feeds the queue, a fixed pool of workers drains it
+SCORING_WORKERS = 4
+SCORING_QUEUE_SIZE = 200
+SCORING_TIMEOUT = 30  # Seconds allowed for a single reply to be scored
+SCORING_BATCH_WINDOW = 5  # Seconds to gather replies to the same question into one request
+SCORING_BATCH_SIZE = 10  # A batch is scored right away once it holds this many replies
+SCORING_BATCH_LOG_EVERY = 50  # Print batching stats after this many batches
+
+scoring_queue = asyncio.Queue(maxsize=SCORING_QUEUE_SIZE)
+scoring_tasks = []
+
+def start_scoring_workers():
+    # on_ready can fire again after a reconnect, so only start the pool once
+    if scoring_tasks:
+        return
+    for _ in range(SCORING_WORKERS):
+        scoring_tasks.append(bot.loop.create_task(scoring_worker()))
 
-            # Analyze the reply
-            await analyze_reply(message)
+async def scoring_worker():
+    while True:
+        reply_message = await scoring_queue.get()
+        try:
+            await asyncio.wait_for(analyze_reply(reply_message), timeout=SCORING_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"Scoring reply {reply_message.id} timed out after {SCORING_TIMEOUT} seconds.")
+        except Exception as e:
+            print(f"An error occurred in the scoring worker: {e}")
+        finally:
+            scoring_queue.task_done()
 
 async def analyze_reply(reply_message):
     try:
@@ -748,110 +1909,468 @@ async def analyze_reply(reply_message):
         if question_message is None:
             return
 
-        # Prepare the messages for the ChatCompletion
-        messages = [
-            {
-                "role": "system",
-                "content": "You are an assistant that evaluates the helpfulness of a reply to a question."
-            },
-            {
-                "role": "user",
-                "content": f"""Question: "{question_message.content}"
+        # Obvious low-value replies are scored locally, only ambiguous ones reach the LLM
+        score = reply_prefilter.classify(reply_message)
+        if score is None:
+            # A pair that was scored before reuses its score instead of calling OpenAI again
+            score = await score_memo.get(question_message, reply_message)
+        if score is None:
+            # Replies to the same question are gathered and scored in one request
+            score_batcher.submit(question_message, reply_message)
+            return
 
-                Reply: "{reply_message.content}"
+        await record_reply_score(reply_message, score)
 
-                On a scale of 1 to 10, where 1 is not helpful at all and 10 is extremely helpful, how helpful is this reply? Provide just the number."""
-            }
-        ]
+    except Exception as e:
+        print(f"An error occurred while analyzing the reply: {e}")
 
-        # Call the OpenAI API
-        response = client.chat.completions.create(
-            model='gpt-3.5-turbo',
-            messages=messages,
-        )
+async def record_reply_score(reply_message, score):
+    # Update the user's score in the database
+    await update_user_score(reply_message.author.id, score)
+
+    # Provide feedback to the responder
+    total_score = await get_user_total_score(reply_message.author.id)
+    await send_score_feedback(reply_message, score, total_score)
+
+class ScoreBatcher:
+    def __init__(self, window=SCORING_BATCH_WINDOW, max_size=SCORING_BATCH_SIZE):
+        self.window = window
+        self.max_size = max_size
+        self.pending = {}  # Key: question message ID, Value: (question message, [reply messages])
+        self.timers = {}  # Key: question message ID, Value: task scoring that question's batch
+        self.tasks = set()  # Every running batch task, so none is garbage-collected mid-flight
+        self.limit = asyncio.Semaphore(SCORING_WORKERS)  # Same cap on concurrent OpenAI calls as the worker pool
+        self.batches = 0
+        self.replies = 0
+        self.fallbacks = 0
+
+    def submit(self, question_message, reply_message):
+        question_id = question_message.id
+        replies = self.pending.setdefault(question_id, (question_message, []))[1]
+        replies.append(reply_message)
+
+        if len(replies) >= self.max_size:
+            # Full batch: stop waiting and score it now
+            timer = self.timers.pop(question_id, None)
+            if timer is not None:
+                timer.cancel()
+            self.spawn(self.flush(*self.pending.pop(question_id)))
+        elif question_id not in self.timers:
+            self.timers[question_id] = self.spawn(self.flush_later(question_id))
+
+    def spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def flush_later(self, question_id):
+        await asyncio.sleep(self.window)
+        del self.timers[question_id]
+        entry = self.pending.pop(question_id, None)
+        if entry is not None:
+            await self.flush(*entry)
+
+    async def flush(self, question_message, replies):
+        async with self.limit:
+            try:
+                try:
+                    scores = await asyncio.wait_for(
+                        score_replies_with_llm(question_message, replies), timeout=SCORING_TIMEOUT
+                    )
+                except ValueError as e:
+                    # The batch answer could not be parsed, so score the replies one by one instead
+                    print(f"Unusable batch score for question {question_message.id} ({e}), scoring replies individually.")
+                    self.fallbacks += 1
+                    scores = await asyncio.wait_for(
+                        score_replies_individually(question_message, replies), timeout=SCORING_TIMEOUT
+                    )
+            except asyncio.TimeoutError:
+                print(f"Scoring {len(replies)} replies to question {question_message.id} timed out after {SCORING_TIMEOUT} seconds.")
+                return
+            except Exception as e:
+                print(f"An error occurred while scoring replies to question {question_message.id}: {e}")
+                return
+
+        self.batches += 1
+        self.replies += len(replies)
+        if self.batches % SCORING_BATCH_LOG_EVERY == 0:
+            print(f"Score batcher stats: {self.stats()}")
+
+        scored_replies = []
+        for reply_message, score in zip(replies, scores):
+            if isinstance(score, Exception):
+                print(f"An error occurred while analyzing reply {reply_message.id}: {score}")
+                continue
+            scored_replies.append((reply_message, score))
+        try:
+            await score_memo.put_many(question_message, scored_replies)
+        except Exception as e:
+            print(f"An error occurred while saving memoized scores: {e}")
+
+        for reply_message, score in scored_replies:
+            try:
+                await record_reply_score(reply_message, score)
+            except Exception as e:
+                print(f"An error occurred while recording the score for reply {reply_message.id}: {e}")
+
+    def stats(self):
+        return {
+            'pending': sum(len(replies) for _, replies in self.pending.values()),
+            'batches': self.batches,
+            'replies': self.replies,
+            'requests_saved': self.replies - self.batches,
+            'fallbacks': self.fallbacks,
+        }
+
+score_batcher = ScoreBatcher()
+
+async def score_replies_individually(question_message, replies):
+    # One request at a time, so the fallback still only holds a single scoring slot
+    scores = []
+    for reply_message in replies:
+        try:
+            scores.append(await score_reply_with_llm(question_message, reply_message))
+        except Exception as e:
+            scores.append(e)
+    return scores
+
+async def score_replies_with_llm(question_message, replies):
+    # A single reply keeps the plain one-number prompt
+    if len(replies) == 1:
+        return [await score_reply_with_llm(question_message, replies[0])]
+
+    numbered = "\n".join(f'{i}. "{reply.content}"' for i, reply in enumerate(replies, start=1))
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an assistant that evaluates the helpfulness of replies to a question."
+        },
+        {
+            "role": "user",
+            "content": f"""Question: "{question_message.content}"
 
-        # Extract the score
-        score_text = response.choices[0].message.content.strip()
-        score = int(score_text)
+Replies:
+{numbered}
 
-        # Ensure the score is within 1-10
-        if score < 1 or score > 10:
-            raise ValueError("Score out of range")
+On a scale of 1 to 10, where 1 is not helpful at all and 10 is extremely helpful, how helpful is each reply? Respond with only a JSON array of {len(replies)} integers, one score per reply in the order given."""
+        }
+    ]
 
-        # Update the user's score in the database
-        await update_user_score(reply_message.author.id, score)
+    response = await async_client.chat.completions.create(
+        model='gpt-3.5-turbo',
+        messages=messages,
+        timeout=SCORING_TIMEOUT,
+    )
 
-        # Provide feedback to the responder
-        total_score = await get_user_total_score(reply_message.author.id)
-        feedback = f"Your reply was rated {score}/10 for helpfulness. Your total score is now {total_score}."
-        await reply_message.channel.send(f"{reply_message.author.mention}, {feedback}")
+    # Pull the JSON array out of the answer, tolerating code fences or stray text around it
+    score_text = response.choices[0].message.content.strip()
+    match = re.search(r'\[.*?\]', score_text, re.DOTALL)
+    if match is None:
+        raise ValueError(f"No JSON array in {score_text!r}")
+    scores = json.loads(match.group(0))
+
+    if len(scores) != len(replies):
+        raise ValueError(f"Expected {len(replies)} scores, got {len(scores)}")
+    for score in scores:
+        if not isinstance(score, int) or isinstance(score, bool) or score < 1 or score > 10:
+            raise ValueError(f"Score out of range: {score!r}")
+    return scores
+
+async def score_reply_with_llm(question_message, reply_message):
+    # Prepare the messages for the ChatCompletion
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an assistant that evaluates the helpfulness of a reply to a question."
+        },
+        {
+            "role": "user",
+            "content": f"""Question: "{question_message.content}"
 
-    except Exception as e:
-        print(f"An error occurred while analyzing the reply: {e}")
+            Reply: "{reply_message.content}"
 
-async def update_user_score(user_id, score):
-    async with aiosqlite.connect(DATABASE) as db:
-        # Check if the user already exists in the database
-        cursor = await db.execute('SELECT total_score, num_replies FROM user_scores WHERE user_id = ?', (user_id,))
-        result = await cursor.fetchone()
+            On a scale of 1 to 10, where 1 is not helpful at all and 10 is extremely helpful, how helpful is this reply? Provide just the number."""
+        }
+    ]
 
-        if result:
-            # Update existing user record
-            total_score, num_replies = result
-            total_score += score
-            num_replies += 1
-            await db.execute('UPDATE user_scores SET total_score = ?, num_replies = ? WHERE user_id = ?', (total_score, num_replies, user_id))
-        else:
-            # Insert new user record
-            await db.execute('INSERT INTO user_scores (user_id, total_score, num_replies) VALUES (?, ?, ?)', (user_id, score, 1))
+    # Call the OpenAI API
+    response = await async_client.chat.completions.create(
+        model='gpt-3.5-turbo',
+        messages=messages,
+        timeout=SCORING_TIMEOUT,
+    )
+
+    # Extract the score
+    score_text = response.choices[0].message.content.strip()
+    score = int(score_text)
+
+    # Ensure the score is within 1-10
+    if score < 1 or score > 10:
+        raise ValueError("Score out of range")
+    return score
+
+# Score feedback. Each channel picks how responders hear about their scores:
+#   embed    - scores from a short window are collected into one embed (default)
+#   reaction - the reply gets a number reaction
+#   message  - one message per reply
+#   off      - no feedback
+FEEDBACK_MODES = ('embed', 'reaction', 'message', 'off')
+DEFAULT_FEEDBACK_MODE = 'embed'
+FEEDBACK_WINDOW = 30  # Seconds to collect scores before posting the summary embed
+SCORE_REACTIONS = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+
+feedback_modes = {}  # Key: channel ID, Value: feedback mode
+
+class FeedbackAggregator:
+    def __init__(self, window=FEEDBACK_WINDOW):
+        self.window = window
+        self.pending = {}  # Key: channel ID, Value: {user ID: [mention, scores, latest total]}
+        self.timers = {}  # Key: channel ID, Value: task posting that channel's summary
+
+    def add(self, channel, author, score, total_score):
+        entries = self.pending.setdefault(channel.id, {})
+        entry = entries.setdefault(author.id, [author.mention, [], total_score])
+        entry[1].append(score)
+        entry[2] = total_score
+        if channel.id not in self.timers:
+            self.timers[channel.id] = asyncio.get_running_loop().create_task(self.flush_later(channel))
+
+    async def flush_later(self, channel):
+        await asyncio.sleep(self.window)
+        del self.timers[channel.id]
+        entries = self.pending.pop(channel.id, {})
+        if not entries:
+            return
+
+        lines = []
+        for mention, scores, total_score in entries.values():
+            rated = ", ".join(f"{score}/10" for score in scores)
+            lines.append(f"{mention}: rated {rated} · total score {total_score}")
+        description = "\n".join(lines)
+        if len(description) > 4096:
+            description = description[:4093] + "..."
+
+        embed = nextcord.Embed(title="⭐ Helpfulness Scores", description=description, color=nextcord.Color.gold())
+        outbound.send(channel, embed=embed, priority=PRIORITY_FEEDBACK)
+
+feedback_aggregator = FeedbackAggregator()
+
+async def send_score_feedback(reply_message, score, total_score):
+    mode = feedback_modes.get(reply_message.channel.id, DEFAULT_FEEDBACK_MODE)
+    if mode == 'embed':
+        feedback_aggregator.add(reply_message.channel, reply_message.author, score, total_score)
+    elif mode == 'reaction':
+        await reply_message.add_reaction(SCORE_REACTIONS[score - 1])
+    elif mode == 'message':
+        feedback = f"Your reply was rated {score}/10 for helpfulness. Your total score is now {total_score}."
+        outbound.send(reply_message.channel, f"{reply_message.author.mention}, {feedback}", priority=PRIORITY_FEEDBACK, coalesce=True)
+
+@bot.command()
+@is_newsletter_manager()
+async def scorefeedback(ctx, mode: str = None):
+    if mode is None:
+        current = feedback_modes.get(ctx.channel.id, DEFAULT_FEEDBACK_MODE)
+        await ctx.send(f"Score feedback in this channel is set to `{current}`. Options: {', '.join(f'`{m}`' for m in FEEDBACK_MODES)}.")
+        return
+
+    mode = mode.lower()
+    if mode not in FEEDBACK_MODES:
+        await ctx.send(f"Unknown mode `{mode}`. Options: {', '.join(f'`{m}`' for m in FEEDBACK_MODES)}.")
+        return
 
+    async with database(DATABASE) as db:
+        await db.execute(
+            'INSERT INTO feedback_settings (channel_id, mode) VALUES (?, ?) ON CONFLICT(channel_id) DO UPDATE SET mode = excluded.mode',
+            (ctx.channel.id, mode)
+        )
         await db.commit()
+    feedback_modes[ctx.channel.id] = mode
+    await ctx.send(f"Score feedback in this channel is now `{mode}`.")
+
+# Score writes are buffered in memory and flushed in one transaction
+SCORE_FLUSH_INTERVAL = 5  # Seconds between scheduled flushes
+SCORE_FLUSH_EVENTS = 50  # Flush early once this many scores are buffered
 
+pending_scores = {}  # Key: user ID, Value: [score delta, reply count delta]
+pending_score_events = 0
+score_flush_lock = asyncio.Lock()
+
+async def update_user_score(user_id, score):
+    global pending_score_events
+    score_leaderboard.add(user_id, score)
+    delta = pending_scores.setdefault(user_id, [0, 0])
+    delta[0] += score
+    delta[1] += 1
+    pending_score_events += 1
+
+    if pending_score_events >= SCORE_FLUSH_EVENTS:
+        await flush_user_scores()
+
+async def flush_user_scores():
+    global pending_scores, pending_score_events
+    async with score_flush_lock:
+        if not pending_scores:
+            return
+        # Swap the buffer out so new scores keep accumulating during the write
+        batch = pending_scores
+        pending_scores = {}
+        pending_score_events = 0
+
+        rows = [(user_id, delta[0], delta[1]) for user_id, delta in batch.items()]
+        db = await get_db(DATABASE)
+        try:
+            # A single upsert per user adds the deltas inside SQLite. The savepoint lets a
+            # failed batch be undone exactly, even if some rows were already applied.
+            await db.execute('SAVEPOINT flush_user_scores')
+            try:
+                await db.executemany('''
+                    INSERT INTO user_scores (user_id, total_score, num_replies) VALUES (?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        total_score = total_score + excluded.total_score,
+                        num_replies = num_replies + excluded.num_replies
+                ''', rows)
+            except Exception:
+                await db.execute('ROLLBACK TO flush_user_scores')
+                await db.execute('RELEASE flush_user_scores')
+                raise
+            await db.execute('RELEASE flush_user_scores')
+        except Exception as e:
+            print(f"An error occurred while flushing user scores: {e}")
+            # Nothing from this batch is in the database, so put the deltas back for the next flush
+            for user_id, delta in batch.items():
+                pending = pending_scores.setdefault(user_id, [0, 0])
+                pending[0] += delta[0]
+                pending[1] += delta[1]
+                pending_score_events += delta[1]
+            return
+
+        try:
+            await db.commit()
+        except Exception as e:
+            # The deltas are applied in the open transaction and go out with the next commit
+            # on this shared connection; queueing them again would count them twice
+            print(f"An error occurred while committing user scores, will retry with the next commit: {e}")
 
 async def get_user_total_score(user_id):
-    async with aiosqlite.connect(DATABASE) as db:
+    if score_leaderboard.loaded:
+        return score_leaderboard.score(user_id)
+    async with database(DATABASE) as db:
         cursor = await db.execute('SELECT total_score FROM user_scores WHERE user_id = ?', (user_id,))
         result = await cursor.fetchone()
-        return result[0] if result else 0
+    # Include scores that have not been flushed yet
+    pending = pending_scores.get(user_id, (0, 0))
+    return (result[0] if result else 0) + pending[0]
 
 async def get_user_average_score(user_id):
-    async with aiosqlite.connect(DATABASE) as db:
+    async with database(DATABASE) as db:
         cursor = await db.execute('SELECT total_score, num_replies FROM user_scores WHERE user_id = ?', (user_id,))
         result = await cursor.fetchone()
-        if result and result[1] > 0:
-            return result[0] / result[1]
-        else:
-            return 0
+    pending = pending_scores.get(user_id, (0, 0))
+    total_score = (result[0] if result else 0) + pending[0]
+    num_replies = (result[1] if result else 0) + pending[1]
+    if num_replies > 0:
+        return total_score / num_replies
+    else:
+        return 0
         
 @bot.command()
 async def myscore(ctx):
     total_score = await get_user_total_score(ctx.author.id)
     await ctx.send(f"{ctx.author.mention}, your total helpfulness score is {total_score}.")
 
-@bot.command()
-async def leaderboard(ctx):
-    async with aiosqlite.connect(DATABASE) as db:
-        cursor = await db.execute('SELECT user_id, total_score FROM user_scores ORDER BY total_score DESC LIMIT 10')
-        top_users = await cursor.fetchall()
+# In-memory leaderboard: totals per user plus the same entries kept sorted by score,
+# so paging and rank lookups are binary searches instead of ORDER BY queries
+LEADERBOARD_PAGE_SIZE = 10
+
+class ScoreLeaderboard:
+    def __init__(self):
+        self.scores = {}  # Key: user ID, Value: total score
+        self.ranked = []  # (-total score, user ID), best first
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def load(self, rows):
+        self.scores = {user_id: total_score for user_id, total_score in rows}
+        self.ranked = sorted((-total_score, user_id) for user_id, total_score in self.scores.items())
+        self.loaded = True
+
+    def score(self, user_id):
+        return self.scores.get(user_id, 0)
+
+    def add(self, user_id, delta):
+        old_score = self.scores.get(user_id)
+        if old_score is not None:
+            index = bisect.bisect_left(self.ranked, (-old_score, user_id))
+            del self.ranked[index]
+        new_score = (old_score or 0) + delta
+        self.scores[user_id] = new_score
+        bisect.insort(self.ranked, (-new_score, user_id))
+
+    def rank(self, user_id):
+        # 1-based rank, or None if the user has no score yet
+        total_score = self.scores.get(user_id)
+        if total_score is None:
+            return None
+        # Users tied on score share the rank of the first of them
+        return bisect.bisect_left(self.ranked, (-total_score, -1)) + 1
+
+    def page(self, page_number, per_page=LEADERBOARD_PAGE_SIZE):
+        start = (page_number - 1) * per_page
+        return [(user_id, -neg_score) for neg_score, user_id in self.ranked[start:start + per_page]]
+
+    def page_count(self, per_page=LEADERBOARD_PAGE_SIZE):
+        return max(1, -(-len(self.ranked) // per_page))
+
+score_leaderboard = ScoreLeaderboard()
 
-    if not top_users:
+@bot.command()
+async def leaderboard(ctx, page: int = 1):
+    if not score_leaderboard:
         await ctx.send("No scores available yet.")
         return
 
-    embed = nextcord.Embed(title="🏆 Leaderboard - Top 10 Helpers", color=nextcord.Color.gold())
-    for rank, (user_id, total_score) in enumerate(top_users, start=1):
+    page_count = score_leaderboard.page_count()
+    if page < 1 or page > page_count:
+        await ctx.send(f"Page {page} does not exist. The leaderboard has {page_count} page(s).")
+        return
+
+    top_users = score_leaderboard.page(page)
+    first_rank = (page - 1) * LEADERBOARD_PAGE_SIZE + 1
+    title = "🏆 Leaderboard - Top 10 Helpers" if page == 1 else f"🏆 Leaderboard - Page {page}"
+    embed = nextcord.Embed(title=title, color=nextcord.Color.gold())
+    for rank, (user_id, total_score) in enumerate(top_users, start=first_rank):
         user = bot.get_user(user_id)
         username = user.name if user else f"User ID {user_id}"
         embed.add_field(name=f"{rank}. {username}", value=f"Score: {total_score}", inline=False)
+    embed.set_footer(text=f"Page {page}/{page_count}")
 
     await ctx.send(embed=embed)
 
+@bot.command()
+async def rank(ctx, member: nextcord.Member = None):
+    if member is None:
+        member = ctx.author
+
+    position = score_leaderboard.rank(member.id)
+    if position is None:
+        await ctx.send(f"{member.display_name} doesn't have a helpfulness score yet.")
+        return
+
+    await ctx.send(f"{member.display_name} is ranked #{position} of {len(score_leaderboard)} with a score of {score_leaderboard.score(member.id)}.")
+
 @bot.event
 async def on_message(message):
     # Ignore messages from bots
     if message.author.bot:
         return
 
+    # Remember the newest message a channel summary would include
+    if counts_for_summary(message):
+        summary_activity[message.channel.id] = message.id
+
     TRACK_CHANNEL_ID = 1311079659894603807
 
     # Only process messages in the specified channel
@@ -861,58 +2380,277 @@ async def on_message(message):
 
         # Check if the message is a question
         if is_question(message.content):
-            await track_question(message)
+            track_question(message)
 
     # Process other bot commands and events
     await bot.process_commands(message)
 
-@bot.command()
-async def summarize(ctx):
-    try:
-        # Fetch the last 15 messages
-        messages = await ctx.channel.history(limit=15).flatten()
-
-        # Prepare the conversation string
-        conversation = ""
-        for message in reversed(messages):
-            if message.author.bot:
-                continue  # Skip bot messages
-            if message.content:
-                author = message.author.display_name
-                content = message.content.strip()
-                conversation += f"{author}: {content}\n"
-
-        # Check if there's any content to summarize
-        if not conversation.strip():
-            await ctx.send("There's no conversation to summarize.")
+# Channel summarizer: history is streamed, split into chunks that fit a token budget,
+# each chunk is summarized in parallel (map) and the partial summaries are merged (reduce).
+# The rolling summary is kept per channel, so a repeat run only reads newer messages.
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_DEFAULT_MESSAGES = 100  # Messages read on a channel's first summary
+SUMMARY_MAX_MESSAGES = 2000
+SUMMARY_CHUNK_TOKENS = 2500  # Rough token budget for the conversation text in one request
+SUMMARY_CONCURRENCY = 4  # Chunk summaries requested at the same time
+SUMMARY_MAX_TOKENS = 300
+SUMMARY_CACHE_SIZE = 200  # Channels kept in memory; least recently used are evicted
+SUMMARY_CACHE_TTL = 24 * 60 * 60  # Summaries older than this are rebuilt from scratch
+SUMMARY_DATABASE = 'summaries.db'  # Set to None to keep the cache in memory only
+
+class CachedSummary:
+    __slots__ = ('last_message_id', 'summary', 'message_count', 'updated_at')
+
+    def __init__(self, last_message_id, summary, message_count, updated_at):
+        self.last_message_id = last_message_id
+        self.summary = summary
+        self.message_count = message_count
+        self.updated_at = updated_at
+
+class SummaryCache:
+    # Summaries keyed by channel, each with the ID of the newest message it covers
+    def __init__(self, max_size=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL, db_path=SUMMARY_DATABASE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.entries = OrderedDict()  # Key: channel ID, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def init(self):
+        if self.db_path is None:
             return
+        async with database(self.db_path) as db:
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS channel_summaries (
+                    channel_id INTEGER PRIMARY KEY,
+                    last_message_id INTEGER NOT NULL,
+                    summary TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            await db.commit()
+
+    def remember(self, channel_id, entry):
+        self.entries[channel_id] = entry
+        self.entries.move_to_end(channel_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, channel_id):
+        entry = self.entries.get(channel_id)
+        if entry is None and self.db_path is not None:
+            async with database(self.db_path) as db:
+                cursor = await db.execute(
+                    'SELECT last_message_id, summary, message_count, updated_at FROM channel_summaries WHERE channel_id = ?',
+                    (channel_id,)
+                )
+                row = await cursor.fetchone()
+            if row is not None:
+                entry = CachedSummary(*row)
+                self.remember(channel_id, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.time() - entry.updated_at > self.ttl:
+            await self.delete(channel_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(channel_id)
+        self.hits += 1
+        return entry
+
+    async def put(self, channel_id, last_message_id, summary, message_count, updated_at=None):
+        entry = CachedSummary(last_message_id, summary, message_count, updated_at or time.time())
+        self.remember(channel_id, entry)
+        if self.db_path is not None:
+            async with database(self.db_path) as db:
+                await db.execute('''
+                    INSERT INTO channel_summaries (channel_id, last_message_id, summary, message_count, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(channel_id) DO UPDATE SET
+                        last_message_id = excluded.last_message_id,
+                        summary = excluded.summary,
+                        message_count = excluded.message_count,
+                        updated_at = excluded.updated_at
+                ''', (channel_id, entry.last_message_id, entry.summary, entry.message_count, entry.updated_at))
+                await db.commit()
 
-        # Create the prompt You are a helpful assistant that summarizes conversations.
-        prompt = f"Summarize the following conversation:\n\n{conversation}"
+    async def delete(self, channel_id):
+        self.entries.pop(channel_id, None)
+        if self.db_path is not None:
+            async with database(self.db_path) as db:
+                await db.execute('DELETE FROM channel_summaries WHERE channel_id = ?', (channel_id,))
+                await db.commit()
 
-        # Call the OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+summary_cache = SummaryCache()
+summary_locks = {}  # Key: channel ID, Value: lock so one channel is summarized at a time
+# Key: channel ID, Value: ID of the newest message a summary would include, as seen by on_message.
+# A channel is only listed once it has been seen live or read in full since startup, so messages
+# posted while the bot was offline can never be mistaken for "nothing new".
+summary_activity = {}
+summary_semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+def counts_for_summary(message):
+    # Bot messages and commands (including !summarize itself) never change a summary
+    return not message.author.bot and bool(message.content) and not message.content.startswith(bot.command_prefix)
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+async def collect_summary_chunks(channel, after_id, limit):
+    # Stream the history oldest first and group lines into token-budgeted chunks.
+    # Returns (chunks, number of messages used, ID of the newest message seen).
+    chunks = []
+    lines = []
+    line_tokens = 0
+    used = 0
+    last_id = after_id
+    after = nextcord.Object(id=after_id) if after_id else None
+    async for message in channel.history(limit=limit, after=after, oldest_first=after is not None):
+        last_id = max(last_id or 0, message.id)
+        if not counts_for_summary(message):
+            continue  # Skip bot messages and commands
+        line = f"{message.author.display_name}: {message.content.strip()}"
+        tokens = estimate_tokens(line)
+        if lines and line_tokens + tokens > SUMMARY_CHUNK_TOKENS:
+            chunks.append(lines)
+            lines, line_tokens = [], 0
+        lines.append(line[:SUMMARY_CHUNK_TOKENS * 4])
+        line_tokens += tokens
+        used += 1
+    if lines:
+        chunks.append(lines)
+
+    # Without a checkpoint, history arrives newest first; put everything in reading order
+    if after is None:
+        chunks = [list(reversed(chunk)) for chunk in reversed(chunks)]
+    return ["\n".join(chunk) for chunk in chunks], used, last_id
+
+async def request_summary(prompt, max_tokens=SUMMARY_MAX_TOKENS):
+    async with summary_semaphore:
+        response = await async_client.chat.completions.create(
+            model=SUMMARY_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that summarizes conversations."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=150,
-            n=1,
-            stop=None,
+            max_tokens=max_tokens,
             temperature=0.7,
         )
+    return response.choices[0].message.content.strip()
+
+async def merge_summaries(group):
+    if len(group) == 1:
+        return group[0]
+    return await request_summary(
+        "Combine these consecutive summaries of one conversation into a single summary, oldest first:\n\n"
+        + "\n\n".join(group)
+    )
+
+async def reduce_summaries(summaries):
+    # Merge partial summaries, in groups if they are too long for one request
+    while len(summaries) > 1:
+        groups = []
+        group, group_tokens = [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if group and group_tokens + tokens > SUMMARY_CHUNK_TOKENS:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(summary)
+            group_tokens += tokens
+        groups.append(group)
+        if len(groups) == len(summaries):
+            # Every summary is over budget on its own; merge them in pairs so the loop still shrinks
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        summaries = await asyncio.gather(*(merge_summaries(group) for group in groups))
+    return summaries[0]
+
+async def summarize_channel(channel, limit):
+    # Returns (summary, messages covered, new messages read); summary is None if there is nothing to summarize
+    lock = summary_locks.setdefault(channel.id, asyncio.Lock())
+    async with lock:
+        cached = await summary_cache.get(channel.id)
+        if cached is not None:
+            last_id, previous_summary, covered = cached.last_message_id, cached.summary, cached.message_count
+            # Nothing a summary would include has been posted since the cached one was made.
+            # channel.last_message_id can't be used here: it is always the !summarize command itself.
+            newest_activity = summary_activity.get(channel.id)
+            if newest_activity is not None and newest_activity <= last_id:
+                return previous_summary, covered, 0
+        else:
+            last_id, previous_summary, covered = None, None, 0
+
+        chunks, used, newest_id = await collect_summary_chunks(channel, last_id, limit)
+
+        if not chunks:
+            # Only commands or bot messages are new: move the watermark, keep the summary and its age
+            if cached is not None and newest_id != last_id:
+                await summary_cache.put(channel.id, newest_id, previous_summary, covered, cached.updated_at)
+            summary_activity.setdefault(channel.id, 0)
+            return previous_summary, covered, 0
+
+        # A small delta is folded straight into the cached summary with one request
+        if previous_summary is not None and len(chunks) == 1:
+            summary = await request_summary(
+                f"Here is a summary of a conversation so far:\n\n{previous_summary}\n\n"
+                f"Update it to also cover these newer messages:\n\n{chunks[0]}"
+            )
+            await summary_cache.put(channel.id, newest_id, summary, covered + used)
+            summary_activity.setdefault(channel.id, 0)
+            return summary, covered + used, used
+
+        # Map: summarize every chunk in parallel
+        partials = await asyncio.gather(*(
+            request_summary(f"Summarize the following conversation:\n\n{chunk}") for chunk in chunks
+        ))
+
+        # Reduce: fold the new partials into the rolling summary
+        if previous_summary is not None:
+            partials = [previous_summary] + list(partials)
+        summary = await reduce_summaries(list(partials))
 
-        # Extract the summary
-        summary = response.choices[0].message.content.strip()
+        await summary_cache.put(channel.id, newest_id, summary, covered + used)
+        summary_activity.setdefault(channel.id, 0)
+        return summary, covered + used, used
+
+@bot.command()
+async def summarize(ctx, limit: int = SUMMARY_DEFAULT_MESSAGES):
+    try:
+        limit = max(1, min(limit, SUMMARY_MAX_MESSAGES))
+        async with ctx.typing():
+            summary, covered, new_messages = await summarize_channel(ctx.channel, limit)
+
+        # Check if there's any content to summarize
+        if summary is None:
+            await ctx.send("There's no conversation to summarize.")
+            return
 
         # Send the summary back to the channel
-        if len(summary) > 2000:
+        header = f"**Summary of the last {covered} messages** ({new_messages} new):\n"
+        if len(header) + len(summary) > 2000:
             await ctx.send("The summary is too long to display.")
         else:
-            await ctx.send(f"**Summary of the last 15 messages:**\n{summary}")
+            await ctx.send(f"{header}{summary}")
 
-    except openai.error.OpenAIError as e:
+    except openai.OpenAIError as e:
         await ctx.send("An error occurred with the AI service.")
         print(f"OpenAI API error: {e}")
     except Exception as e:
@@ -921,6 +2659,7 @@ async def summarize(ctx):
         
 
 # Make a complement to pair with the roasts
-datoken = os.getenv('NEW_BOT_TOKEN')
-print(datoken)
-bot.run(datoken)
+if __name__ == '__main__':
+    datoken = os.getenv('NEW_BOT_TOKEN')
+    print(datoken)
+    bot.run(datoken)
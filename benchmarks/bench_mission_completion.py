@@ -0,0 +1,102 @@
+# Latency benchmark for completing missions.
+# Compares complete_mission (one savepoint, grouped commits, indexed badge checks) against
+# the original flow: separate SELECTs for quests and XP, then a commit after every write.
+#
+#   python benchmarks/bench_mission_completion.py
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 300
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    def at(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+    return statistics.mean(latencies) * 1000, at(0.5), at(0.95), at(0.99)
+
+def bench_original(bot, completions):
+    # The original synchronous flow, with a commit after each statement
+    conn = sqlite3.connect('baseline.db')
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE users (user_id INTEGER PRIMARY KEY, xp INTEGER DEFAULT 0)')
+    cursor.execute('CREATE TABLE completed_quests (user_id INTEGER, quest_name TEXT, PRIMARY KEY (user_id, quest_name))')
+    cursor.execute('CREATE TABLE awarded_badges (user_id INTEGER, badge_name TEXT, PRIMARY KEY (user_id, badge_name))')
+    conn.commit()
+
+    # LevelingBot's badges list is shadowed by the !badges command, so rebuild it from the index
+    badges = list({badge["name"]: badge for group in bot.badges_by_mission.values() for badge in group}.values())
+
+    latencies = []
+    for user_id, mission in completions:
+        start = time.perf_counter()
+        cursor.execute('SELECT quest_name FROM completed_quests WHERE user_id = ?', (user_id,))
+        if mission["name"] not in [row[0] for row in cursor.fetchall()]:
+            cursor.execute('SELECT xp FROM users WHERE user_id = ?', (user_id,))
+            result = cursor.fetchone()
+            if result is None:
+                cursor.execute('INSERT INTO users (user_id, xp) VALUES (?, ?)', (user_id, 0))
+                conn.commit()
+            xp = (result[0] if result else 0) + mission["xp_reward"]
+            cursor.execute('UPDATE users SET xp = ? WHERE user_id = ?', (xp, user_id))
+            conn.commit()
+            cursor.execute('INSERT INTO completed_quests (user_id, quest_name) VALUES (?, ?)', (user_id, mission["name"]))
+            conn.commit()
+
+            cursor.execute('SELECT quest_name FROM completed_quests WHERE user_id = ?', (user_id,))
+            completed = {row[0] for row in cursor.fetchall()}
+            cursor.execute('SELECT badge_name FROM awarded_badges WHERE user_id = ?', (user_id,))
+            awarded = {row[0] for row in cursor.fetchall()}
+            for badge in badges:
+                if set(badge["missions"]).issubset(completed) and badge["name"] not in awarded:
+                    cursor.execute('INSERT INTO awarded_badges (user_id, badge_name) VALUES (?, ?)', (user_id, badge["name"]))
+                    conn.commit()
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies
+
+async def bench_current(bot, completions):
+    await bot.get_db()
+    latencies = []
+    for user_id, mission in completions:
+        start = time.perf_counter()
+        await bot.complete_mission(user_id, mission)
+        latencies.append(time.perf_counter() - start)
+
+    # A burst of commands arriving together, as on a busy club night
+    burst_start = time.perf_counter()
+    await asyncio.gather(*(bot.complete_mission(USERS + user_id, mission) for user_id, mission in completions))
+    burst = time.perf_counter() - burst_start
+    await bot.close_db()
+    return latencies, burst
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        # The bot opens bot_data.db relative to the working directory
+        os.chdir(workdir)
+        import LevelingBot as bot
+
+        rng = random.Random(0)
+        completions = [(user_id, mission) for user_id in range(USERS) for mission in bot.missions]
+        rng.shuffle(completions)
+
+        original = bench_original(bot, completions)
+        current, burst = asyncio.run(bench_current(bot, completions))
+        os.chdir(ROOT)
+
+    print(f"{len(completions)} mission completions across {USERS} users (ms)")
+    print(f"{'':>18} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for name, latencies in (('original', original), ('complete_mission', current)):
+        print(f"{name:>18} " + " ".join(f"{value:7.3f}" for value in percentiles(latencies)))
+    print(f"concurrent burst of {len(completions)}: {burst:.2f} s ({len(completions) / burst:.0f} completions/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Throughput benchmark for reply-score writes.
+# Compares the buffered update_user_score/flush_user_scores path against the original
+# write-per-score approach (new connection, SELECT, UPDATE or INSERT, commit every time).
+#
+#   python benchmarks/bench_score_writes.py
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCORES = 5000
+USERS = 500
+
+async def per_score_update(path, user_id, score):
+    # The original update_user_score
+    async with aiosqlite.connect(path) as db:
+        cursor = await db.execute('SELECT total_score, num_replies FROM user_scores WHERE user_id = ?', (user_id,))
+        result = await cursor.fetchone()
+        if result:
+            total_score, num_replies = result
+            await db.execute(
+                'UPDATE user_scores SET total_score = ?, num_replies = ? WHERE user_id = ?',
+                (total_score + score, num_replies + 1, user_id)
+            )
+        else:
+            await db.execute('INSERT INTO user_scores (user_id, total_score, num_replies) VALUES (?, ?, ?)', (user_id, score, 1))
+        await db.commit()
+
+async def bench_per_score(scores):
+    path = 'baseline_scores.db'
+    async with aiosqlite.connect(path) as db:
+        await db.execute('CREATE TABLE user_scores (user_id INTEGER PRIMARY KEY, total_score INTEGER NOT NULL, num_replies INTEGER NOT NULL)')
+        await db.commit()
+    start = time.perf_counter()
+    for user_id, score in scores:
+        await per_score_update(path, user_id, score)
+    return time.perf_counter() - start
+
+async def bench_buffered(bot, scores):
+    await bot.init_score_db()
+    start = time.perf_counter()
+    for user_id, score in scores:
+        await bot.update_user_score(user_id, score)
+    await bot.flush_user_scores()
+    elapsed = time.perf_counter() - start
+
+    # Every delta must have reached the table
+    async with bot.database(bot.DATABASE) as db:
+        cursor = await db.execute('SELECT SUM(total_score), SUM(num_replies) FROM user_scores')
+        total_score, num_replies = await cursor.fetchone()
+    assert total_score == sum(score for _, score in scores) and num_replies == len(scores)
+    await bot.close_databases()
+    return elapsed
+
+def main():
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    with tempfile.TemporaryDirectory() as workdir:
+        # The bot creates its databases relative to the working directory
+        os.chdir(workdir)
+        import Nov30DiscordBot as bot
+
+        rng = random.Random(0)
+        scores = [(rng.randrange(USERS), rng.randint(1, 10)) for _ in range(SCORES)]
+
+        baseline = asyncio.run(bench_per_score(scores))
+        buffered = asyncio.run(bench_buffered(bot, scores))
+        os.chdir(ROOT)
+
+    print(f"{SCORES} scores across {USERS} users")
+    print(f"  write per score: {baseline:7.2f} s  {SCORES / baseline:10.0f} scores/s")
+    print(f"  buffered:        {buffered:7.2f} s  {SCORES / buffered:10.0f} scores/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Benchmark for the in-memory XP ranking used by !xp_leaderboard and !status.
+# Compares XPRanking against sorting every user on each call, at 10k, 100k and 1M users.
+# XP is drawn from a few attendance-sized steps so most users sit in large tie groups.
+#
+#   python benchmarks/bench_xp_ranking.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LevelingBot import XPRanking
+
+SIZES = [10_000, 100_000, 1_000_000]
+PAGE_SIZE = 10
+REPEATS = 200
+
+def timed(function, repeats=REPEATS):
+    # Average milliseconds per call
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+def make_rows(count):
+    rng = random.Random(count)
+    user_ids = rng.sample(range(10 ** 17, 10 ** 18), count)
+    return [(user_id, rng.choice((0, 10, 20, 30, 50, 125, 275))) for user_id in user_ids]
+
+def main():
+    print(f"{'users':>9} {'load s':>8} {'top ms':>8} {'deep ms':>8} {'rank ms':>8} {'add ms':>8} {'sort ms':>9}")
+    for count in SIZES:
+        rows = make_rows(count)
+        ranking = XPRanking()
+        start = time.perf_counter()
+        ranking.load(rows)
+        load_seconds = time.perf_counter() - start
+
+        rng = random.Random(0)
+        user_ids = [user_id for user_id, _ in rows]
+        deep_offset = count // 2
+
+        top_ms = timed(lambda: ranking.top(PAGE_SIZE))
+        deep_ms = timed(lambda: ranking.top(PAGE_SIZE, deep_offset))
+        rank_ms = timed(lambda: ranking.rank(rng.choice(user_ids)))
+        # Attendance moves users between the large tie groups
+        add_ms = timed(lambda: ranking.add(rng.choice(user_ids), 10))
+
+        # The approach XPRanking replaces: sort everyone on every leaderboard request
+        xp = dict(ranking.xp)
+        sort_ms = timed(lambda: sorted(xp.items(), key=lambda item: (-item[1], item[0]))[:PAGE_SIZE], repeats=3)
+
+        print(f"{count:>9} {load_seconds:>8.2f} {top_ms:>8.3f} {deep_ms:>8.3f} {rank_ms:>8.3f} {add_ms:>8.3f} {sort_ms:>9.1f}")
+
+if __name__ == '__main__':
+    main()
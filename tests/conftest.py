@@ -0,0 +1,19 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def bot_module(tmp_path_factory):
+    # The bot creates its databases and PDF folders relative to the working directory,
+    # so import it from a scratch directory
+    os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+    previous_cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('bot'))
+    try:
+        yield importlib.import_module('Nov30DiscordBot')
+    finally:
+        os.chdir(previous_cwd)
@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+import hashlib
+import socket
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+
+LAST_MODIFIED = 'Sat, 17 Oct 2026 09:00:00 GMT'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class FeedServer:
+    # Serves an RSS feed of numbered issues, newest first; answers 304 to matching validators
+    # unless ignore_validators is set, like servers that always send the full body
+    def __init__(self, issues, ignore_validators=False):
+        self.issues = issues
+        self.ignore_validators = ignore_validators
+        self.requests = []
+
+    def body(self):
+        items = ''.join(
+            f'<item><title>Issue {n}</title><link>https://example.com/issue/{n}</link>'
+            f'<description>&lt;p&gt;Issue {n} summary&lt;/p&gt;</description></item>'
+            for n in sorted(self.issues, reverse=True)
+        )
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Test</title>{items}</channel></rss>'.encode()
+
+    async def handle(self, request):
+        self.requests.append(dict(request.headers))
+        body = self.body()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if not self.ignore_validators:
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304)
+            headers = {'ETag': etag, 'Last-Modified': LAST_MODIFIED}
+        else:
+            headers = {}
+        return web.Response(body=body, headers=headers, content_type='application/rss+xml')
+
+@contextlib.asynccontextmanager
+async def serve(bot_module, feed_server):
+    app = web.Application()
+    app.router.add_get('/feed', feed_server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    url = f'http://127.0.0.1:{port}/feed'
+    try:
+        yield url
+    finally:
+        if bot_module.http_session is not None:
+            await bot_module.http_session.close()
+            bot_module.http_session = None
+        await bot_module.close_databases()
+        await runner.cleanup()
+
+@pytest.fixture
+def feed_state(bot_module, monkeypatch):
+    # Fresh validators and posted IDs for every test
+    monkeypatch.setattr(bot_module, 'feed_validators', {})
+    monkeypatch.setattr(bot_module, 'posted_newsletter_ids', set())
+    monkeypatch.setattr(bot_module, 'unsaved_posted_ids', [])
+    monkeypatch.setattr(bot_module, 'http_session', None)
+    return bot_module
+
+@pytest.fixture
+def discord_channel(bot_module, monkeypatch):
+    # Stands in for the newsletter channel; records the embeds handed to the dispatcher
+    channel = SimpleNamespace(id=1291424889655394537, posted=[])
+
+    async def fetch_channel(channel_id):
+        return channel
+
+    async def send(target, content=None, embed=None, **kwargs):
+        target.posted.append(embed)
+        return SimpleNamespace(id=len(target.posted))
+
+    monkeypatch.setattr(bot_module.bot, 'fetch_channel', fetch_channel)
+    monkeypatch.setattr(bot_module.outbound, 'send', send)
+    return channel
+
+def test_unchanged_feed_answers_304(feed_state):
+    bot_module = feed_state
+    feed_server = FeedServer(range(1, 4))
+
+    async def run():
+        async with serve(bot_module, feed_server) as url:
+            first = await bot_module.fetch_feed_entries(url)
+            second = await bot_module.fetch_feed_entries(url)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [entry.title for entry in first] == ['Issue 3', 'Issue 2', 'Issue 1']
+    assert second == []
+    assert 'If-None-Match' not in feed_server.requests[0]
+    assert feed_server.requests[1]['If-None-Match'].startswith('"')
+    assert feed_server.requests[1]['If-Modified-Since'] == LAST_MODIFIED
+
+def test_unchanged_body_is_not_parsed_again(feed_state, monkeypatch):
+    bot_module = feed_state
+    feed_server = FeedServer(range(1, 4), ignore_validators=True)
+    parse = bot_module.feedparser.parse
+    parsed = []
+
+    def counting_parse(body):
+        parsed.append(body)
+        return parse(body)
+
+    monkeypatch.setattr(bot_module.feedparser, 'parse', counting_parse)
+
+    async def run():
+        async with serve(bot_module, feed_server) as url:
+            first = await bot_module.fetch_feed_entries(url)
+            second = await bot_module.fetch_feed_entries(url)
+            feed_server.issues = range(1, 5)
+            third = await bot_module.fetch_feed_entries(url)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert len(feed_server.requests) == 3
+    assert len(first) == 3 and second == [] and len(third) == 4
+    assert len(parsed) == 2
+
+def test_new_entries_post_oldest_first_up_to_the_cap(feed_state, discord_channel, monkeypatch):
+    bot_module = feed_state
+    feed_server = FeedServer(range(1, 9))
+
+    async def run():
+        async with serve(bot_module, feed_server) as url:
+            monkeypatch.setattr(bot_module, 'NEWSLETTER_FEEDS', {url: 'Test Feed'})
+            await bot_module.load_posted_newsletters()
+            bot_module.posted_newsletter_ids.add('https://example.com/issue/1')
+            await bot_module.check_and_post_newsletter()
+
+    asyncio.run(run())
+    # Seven issues are new; the newest five are posted oldest first
+    assert bot_module.NEWSLETTER_MAX_POSTS_PER_POLL == 5
+    assert [embed.title for embed in discord_channel.posted] == [f'Issue {n}' for n in range(4, 9)]
+    assert discord_channel.posted[0].author.name == 'Test Feed'
+    assert discord_channel.posted[0].description == 'Issue 4 summary'
+    # The two that didn't fit are recorded so they never come back
+    assert {f'https://example.com/issue/{n}' for n in range(1, 9)} <= bot_module.posted_newsletter_ids
+    assert bot_module.unsaved_posted_ids == []
+
+def test_unseen_feed_posts_only_its_newest_entry(feed_state, discord_channel, monkeypatch):
+    bot_module = feed_state
+    feed_server = FeedServer(range(1, 9))
+
+    async def run():
+        async with serve(bot_module, feed_server) as url:
+            monkeypatch.setattr(bot_module, 'NEWSLETTER_FEEDS', {url: 'Test Feed'})
+            await bot_module.load_posted_newsletters()
+            bot_module.posted_newsletter_ids.clear()
+            await bot_module.check_and_post_newsletter()
+            first_poll = [embed.title for embed in discord_channel.posted]
+
+            # Nothing changed, so the next poll is answered with a 304
+            await bot_module.check_and_post_newsletter()
+            unchanged_poll = [embed.title for embed in discord_channel.posted[len(first_poll):]]
+
+            feed_server.issues = range(1, 10)
+            await bot_module.check_and_post_newsletter()
+            next_poll = [embed.title for embed in discord_channel.posted[len(first_poll):]]
+        return first_poll, unchanged_poll, next_poll
+
+    first_poll, unchanged_poll, next_poll = asyncio.run(run())
+    assert first_poll == ['Issue 8']
+    assert unchanged_poll == []
+    assert next_poll == ['Issue 9']
@@ -0,0 +1,114 @@
+import asyncio
+import smtplib
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+from aiosmtpd.controller import Controller
+
+class RecordingHandler:
+    # Accepts every message and keeps it; can refuse the first MAIL FROM with a 421
+    def __init__(self, refuse_first_mail=False):
+        self.messages = []
+        self.refuse_first_mail = refuse_first_mail
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.refuse_first_mail:
+            self.refuse_first_mail = False
+            return '421 4.4.2 Closing idle connection'
+        envelope.mail_from = address
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content)
+        return '250 OK'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server(bot_module, monkeypatch):
+    # Starts a local SMTP server and points the bot at it; the bot's own opener does
+    # STARTTLS and login, which the test server doesn't offer, so opens are counted here
+    servers = []
+    opens = []
+
+    def start(handler=None, timeout=300):
+        handler = handler or RecordingHandler()
+        port = free_port()
+        controller = Controller(handler, hostname='127.0.0.1', port=port, timeout=timeout)
+        controller.start()
+        servers.append(controller)
+
+        def open_test_session():
+            opens.append(time.monotonic())
+            return smtplib.SMTP('127.0.0.1', port, timeout=10)
+
+        monkeypatch.setattr(bot_module, 'open_smtp_session', open_test_session)
+        return handler, opens
+
+    monkeypatch.setenv('EMAIL_FROM_ADDRESS', 'bot@example.com')
+    bot_module.smtp_session = None
+    yield start
+    bot_module.close_smtp_session()
+    for controller in servers:
+        controller.stop()
+
+@pytest.fixture
+def pdf_files(tmp_path):
+    path = tmp_path / 'notes.pdf'
+    path.write_bytes(b'%PDF-1.4 test document')
+    return [(str(path), 'notes.pdf')]
+
+def test_session_is_reused_across_sends(bot_module, smtp_server, pdf_files):
+    handler, opens = smtp_server()
+    for i in range(3):
+        bot_module.send_pdf_email(f'member{i}@example.com', pdf_files)
+
+    assert len(opens) == 1
+    assert len(handler.messages) == 3
+    assert all(b'filename="notes.pdf"' in message for message in handler.messages)
+
+def test_reconnects_after_server_disconnect(bot_module, smtp_server, pdf_files):
+    # The server drops idle sessions after 0.3 seconds
+    handler, opens = smtp_server(timeout=0.3)
+    bot_module.send_pdf_email('member@example.com', pdf_files)
+    time.sleep(0.8)
+    bot_module.send_pdf_email('member@example.com', pdf_files)
+
+    assert len(opens) == 2
+    assert len(handler.messages) == 2
+
+def test_reconnects_after_421_response(bot_module, smtp_server, pdf_files):
+    handler, opens = smtp_server(RecordingHandler(refuse_first_mail=True))
+    bot_module.send_pdf_email('member@example.com', pdf_files)
+
+    assert len(opens) == 2
+    assert len(handler.messages) == 1
+
+def test_mail_worker_reports_each_send(bot_module, smtp_server, pdf_files):
+    handler, opens = smtp_server()
+    replies = []
+
+    async def record_reply(**kwargs):
+        replies.append(kwargs['content'])
+
+    async def run():
+        channel = SimpleNamespace(id=424242, send=record_reply)
+        ctx = SimpleNamespace(channel=channel, author=SimpleNamespace(mention='@member'))
+        worker = asyncio.get_running_loop().create_task(bot_module.mail_worker())
+        for i in range(2):
+            bot_module.mail_queue.put_nowait((ctx, f'member{i}@example.com', pdf_files))
+        await bot_module.mail_queue.join()
+        # Confirmations go out through the outbound dispatcher, so they can land after join()
+        while not any('member1@example.com' in reply for reply in replies):
+            await asyncio.sleep(0.01)
+        worker.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert len(opens) == 1
+    assert len(handler.messages) == 2
+    assert all('email sent successfully' in line for reply in replies for line in reply.splitlines())
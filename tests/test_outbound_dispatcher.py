@@ -0,0 +1,163 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+class FakeTransport:
+    # Records every send instead of talking to Discord
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    async def __call__(self, channel, **kwargs):
+        if self.fail:
+            raise RuntimeError("transport down")
+        self.sent.append((channel.id, kwargs, time.monotonic()))
+        return SimpleNamespace(id=len(self.sent), kwargs=kwargs)
+
+def make_dispatcher(bot_module, transport, channel_limit=(100, 1.0), global_limit=(1000, 1.0)):
+    return bot_module.OutboundDispatcher(sender=transport, channel_limit=channel_limit, global_limit=global_limit)
+
+def test_higher_priority_goes_first(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport)
+        channel = SimpleNamespace(id=1)
+        futures = [
+            dispatcher.send(channel, 'feedback', priority=bot_module.PRIORITY_FEEDBACK),
+            dispatcher.send(channel, 'normal 1'),
+            dispatcher.send(channel, 'newsletter', priority=bot_module.PRIORITY_NEWSLETTER),
+            dispatcher.send(channel, 'normal 2'),
+        ]
+        await asyncio.gather(*futures)
+        return [kwargs['content'] for _, kwargs, _ in transport.sent]
+
+    assert asyncio.run(run()) == ['newsletter', 'normal 1', 'normal 2', 'feedback']
+
+def test_coalesced_text_is_merged_into_one_message(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport)
+        channel = SimpleNamespace(id=1)
+        merged = [
+            dispatcher.send(channel, f'score {i}', priority=bot_module.PRIORITY_FEEDBACK, coalesce=True)
+            for i in range(3)
+        ]
+        separate = dispatcher.send(channel, 'not merged', priority=bot_module.PRIORITY_FEEDBACK)
+        messages = await asyncio.gather(*merged)
+        await separate
+        return transport.sent, messages
+
+    sent, messages = asyncio.run(run())
+    assert [kwargs for _, kwargs, _ in sent] == [
+        {'content': 'score 0\nscore 1\nscore 2'},
+        {'content': 'not merged'},
+    ]
+    # Every merged send resolves to the one message that carried it
+    assert messages[0] is messages[1] is messages[2]
+
+def test_coalescing_respects_the_message_length_limit(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport)
+        channel = SimpleNamespace(id=1)
+        text = 'x' * (bot_module.MAX_MESSAGE_LENGTH // 2 - 1)  # Two fit in one message, three don't
+        await asyncio.gather(*(dispatcher.send(channel, text, coalesce=True) for _ in range(3)))
+        return transport.sent
+
+    sent = asyncio.run(run())
+    assert len(sent) == 2
+    assert all(len(kwargs['content']) <= 2000 for _, kwargs, _ in sent)
+
+def test_embeds_are_never_merged(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport)
+        channel = SimpleNamespace(id=1)
+        embed = object()
+        await asyncio.gather(
+            dispatcher.send(channel, 'text', coalesce=True),
+            dispatcher.send(channel, embed=embed, coalesce=True),
+        )
+        return transport.sent
+
+    sent = asyncio.run(run())
+    assert len(sent) == 2
+    assert 'embed' in sent[1][1]
+
+def test_channel_bucket_paces_sends(bot_module):
+    # Burst of 2, then one message every 0.1 seconds
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport, channel_limit=(2, 0.2))
+        channel = SimpleNamespace(id=1)
+        start = time.monotonic()
+        await asyncio.gather(*(dispatcher.send(channel, f'message {i}') for i in range(5)))
+        return [sent_at - start for _, _, sent_at in transport.sent]
+
+    offsets = asyncio.run(run())
+    assert len(offsets) == 5
+    assert offsets[1] < 0.05  # The burst goes out straight away
+    assert offsets[4] >= 0.25  # The remaining three wait for refills
+    assert all(later >= earlier for earlier, later in zip(offsets, offsets[1:]))
+
+def test_channels_are_paced_independently(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport, channel_limit=(1, 0.5))
+        busy, quiet = SimpleNamespace(id=1), SimpleNamespace(id=2)
+        start = time.monotonic()
+        busy_sends = [dispatcher.send(busy, f'busy {i}') for i in range(3)]
+        await dispatcher.send(quiet, 'quiet')
+        quiet_done = time.monotonic() - start
+        await asyncio.gather(*busy_sends)
+        return quiet_done
+
+    assert asyncio.run(run()) < 0.1
+
+def test_global_bucket_paces_all_channels(bot_module):
+    async def run():
+        transport = FakeTransport()
+        dispatcher = make_dispatcher(bot_module, transport, global_limit=(2, 0.2))
+        start = time.monotonic()
+        await asyncio.gather(*(dispatcher.send(SimpleNamespace(id=i), 'hello') for i in range(4)))
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.15
+
+def test_failed_send_resolves_to_none(bot_module):
+    async def run():
+        dispatcher = make_dispatcher(bot_module, FakeTransport(fail=True))
+        return await dispatcher.send(SimpleNamespace(id=1), 'hello')
+
+    assert asyncio.run(run()) is None
+
+def test_failed_newsletter_post_keeps_the_row(bot_module, monkeypatch):
+    channel = SimpleNamespace(id=77, name='announcements')
+    retries = []
+
+    async def failed_send(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(bot_module.bot, 'get_channel', lambda channel_id: channel)
+    monkeypatch.setattr(bot_module.outbound, 'send', failed_send)
+    monkeypatch.setattr(bot_module, 'schedule_newsletter_jobs', retries.extend)
+
+    async def run():
+        await bot_module.init_db()
+        db = await bot_module.get_db(bot_module.NEWSLETTER_DATABASE)
+        cursor = await db.execute(
+            'INSERT INTO newsletters (title, content, scheduled_time, channel_id) VALUES (?, ?, ?, ?) RETURNING id',
+            ('Weekly', 'News', '2026-01-01T09:00:00', channel.id)
+        )
+        newsletter_id = (await cursor.fetchone())[0]
+        await db.commit()
+
+        await bot_module.post_newsletter(newsletter_id, 'Weekly', 'News', channel.id)
+        cursor = await db.execute('SELECT COUNT(*) FROM newsletters WHERE id = ?', (newsletter_id,))
+        remaining = (await cursor.fetchone())[0]
+        await bot_module.close_databases()
+        return newsletter_id, remaining
+
+    newsletter_id, remaining = asyncio.run(run())
+    assert remaining == 1
+    assert [job[0] for job in retries] == [newsletter_id]
@@ -0,0 +1,64 @@
+import asyncio
+
+async def stored_score(bot_module, user_id):
+    db = await bot_module.get_db(bot_module.DATABASE)
+    cursor = await db.execute('SELECT total_score, num_replies FROM user_scores WHERE user_id = ?', (user_id,))
+    return await cursor.fetchone()
+
+def test_failed_commit_is_not_counted_twice(bot_module, monkeypatch):
+    user_id = 9001
+
+    async def run():
+        await bot_module.init_score_db()
+        db = await bot_module.get_db(bot_module.DATABASE)
+        commit = db.commit
+        failures = []
+
+        async def commit_fails_once():
+            if not failures:
+                failures.append(True)
+                raise RuntimeError("database is locked")
+            await commit()
+
+        monkeypatch.setattr(db, 'commit', commit_fails_once)
+        await bot_module.update_user_score(user_id, 7)
+        await bot_module.flush_user_scores()
+        assert failures
+        # The rows went into the open transaction, so nothing is queued again
+        assert user_id not in bot_module.pending_scores
+
+        await bot_module.update_user_score(user_id, 3)
+        await bot_module.flush_user_scores()
+        result = await stored_score(bot_module, user_id)
+        await bot_module.close_databases()
+        return result
+
+    assert asyncio.run(run()) == (10, 2)
+
+def test_failed_upsert_is_rolled_back_and_retried(bot_module, monkeypatch):
+    user_ids = (9101, 9102, 9103)
+
+    async def run():
+        await bot_module.init_score_db()
+        db = await bot_module.get_db(bot_module.DATABASE)
+        executemany = db.executemany
+
+        async def fails_after_writing(sql, rows):
+            # Apply the rows, then fail, like an error partway through the batch
+            await executemany(sql, rows)
+            raise RuntimeError("disk I/O error")
+
+        monkeypatch.setattr(db, 'executemany', fails_after_writing)
+        for user_id in user_ids:
+            await bot_module.update_user_score(user_id, 5)
+        await bot_module.flush_user_scores()
+        assert [await stored_score(bot_module, user_id) for user_id in user_ids] == [None, None, None]
+        assert all(bot_module.pending_scores[user_id] == [5, 1] for user_id in user_ids)
+
+        monkeypatch.setattr(db, 'executemany', executemany)
+        await bot_module.flush_user_scores()
+        result = [await stored_score(bot_module, user_id) for user_id in user_ids]
+        await bot_module.close_databases()
+        return result
+
+    assert asyncio.run(run()) == [(5, 1), (5, 1), (5, 1)]